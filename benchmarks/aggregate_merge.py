@@ -0,0 +1,87 @@
+# ===============================================
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Make the 'src' package importable when this file is run directly as a script.
+if str(Path(__file__).parent.parent.absolute()) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+from src.aggregate import merge_table5
+
+# Cohort sizes to measure, every size is twice the previous one, so a linear merge doubles its time per step.
+DEFAULT_SIZES = (250, 500, 1000, 2000, 4000)
+# ===============================================
+
+
+def make_aggregated_table5(studentCount: int, outcomeCount: int = 11, assessmentCount: int = 5) -> list:
+    """
+    Description: Builds the list that aggregate_lesson() hands to merge_table5(): a table5 and a blank separator per student.
+    Parameters:
+        studentCount (int) : Number of students in the lesson.
+        outcomeCount (int) : Number of program outcomes (rows of a student's table5).
+        assessmentCount (int) : Number of assessments (Başarı columns of a student's table5).
+    Returns:
+        list : [table5, separator, table5, separator, ...]
+    """
+    rng = np.random.default_rng(0)
+    aggregatedTable5 = list()
+
+    for student in range(studentCount):
+        columns = ["Öğrenci No", "Prg Çıktı"] + [f"{value}.{i}" for i, value in enumerate(rng.integers(0, 100, assessmentCount))] + ["Başarı Oranı"]
+        values = np.empty((outcomeCount, len(columns)), dtype=object)
+        values[:, 0] = str(200000000 + student)
+        values[:, 1] = np.arange(1, outcomeCount + 1)
+        values[:, 2:] = np.round(rng.random((outcomeCount, assessmentCount + 1)) * 100, 1)
+
+        aggregatedTable5.append(pd.DataFrame(values, columns=columns))
+        aggregatedTable5.append(pd.DataFrame(columns=[""] * len(columns)))
+
+    return aggregatedTable5
+
+
+def merge_table5_quadratic(aggregatedTable5: list) -> pd.DataFrame:
+    """Previous implementation of the merge, one pd.concat per table, kept for comparison."""
+    mergedDf = pd.DataFrame(columns=[str(i + 1) for i in range(aggregatedTable5[0].shape[1])])
+    for table5 in aggregatedTable5:
+        columnNamesRow = pd.DataFrame([table5.columns], columns=mergedDf.columns)
+        dfReset = pd.DataFrame(table5.values, columns=mergedDf.columns)
+        mergedDf = pd.concat([mergedDf, columnNamesRow, dfReset], ignore_index=True)
+    return mergedDf
+
+
+def best_of(function, argument, repeat: int) -> float:
+    """Returns the best wall time (seconds) of 'repeat' calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measures how the aggregated table5 merge scales with the cohort size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Cohort sizes to measure.")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs per size.")
+    parser.add_argument("--skip-quadratic", action="store_true", help="Don't measure the previous implementation.")
+    args = parser.parse_args()
+
+    print(f"{'students':>9} {'merge_table5 (s)':>17} {'us/student':>11} {'quadratic (s)':>14} {'us/student':>11}")
+    for size in args.sizes:
+        aggregatedTable5 = make_aggregated_table5(size)
+
+        # Both implementations must produce the same layout.
+        linear = merge_table5(aggregatedTable5)
+        if not args.skip_quadratic:
+            assert linear.equals(merge_table5_quadratic(aggregatedTable5).astype(object))
+
+        linearTime = best_of(merge_table5, aggregatedTable5, args.repeat)
+        row = f"{size:>9} {linearTime:>17.4f} {linearTime / size * 1e6:>11.1f}"
+        if not args.skip_quadratic:
+            quadraticTime = best_of(merge_table5_quadratic, aggregatedTable5, args.repeat)
+            row += f" {quadraticTime:>14.4f} {quadraticTime / size * 1e6:>11.1f}"
+        print(row)
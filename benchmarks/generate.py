@@ -0,0 +1,143 @@
+# ===============================================
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Make the 'src' package importable when this file is run directly as a script.
+if str(Path(__file__).parent.parent.absolute()) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+from src.writer import write_excel
+
+# First synthetic student id, ids look like real ones (9 digits).
+FIRST_STUDENT_ID = 200000000
+# ===============================================
+
+
+def assessment_names(assessmentCount: int) -> list:
+    """Returns assessment names like the real lessons use: Öd1, Öd2, ..., Vize, Fin."""
+    return [f"Öd{i + 1}" for i in range(assessmentCount - 2)] + ["Vize", "Fin"]
+
+
+def make_table_one(rng: np.random.Generator, programOutcomes: int, lessonOutcomes: int) -> pd.DataFrame:
+    """
+    Description: Builds table1 (program outcome × lesson outcome relations) in the input template's layout.
+    Parameters:
+        rng (np.random.Generator) : Random generator.
+        programOutcomes (int) : Number of program outcomes (rows).
+        lessonOutcomes (int) : Number of lesson outcomes (columns).
+    Returns:
+        pd.DataFrame : Table1, its first row holds the lesson outcome numbers.
+    """
+    relations = rng.choice([0, 0, 0.2, 0.5, 1], size=(programOutcomes, lessonOutcomes))
+
+    # A program outcome without any related lesson outcome has a maximum success of 0 (table5 would divide by it),
+    # real lessons always relate every program outcome to at least one lesson outcome.
+    for row in np.flatnonzero(~relations.any(axis=1)):
+        relations[row, rng.integers(lessonOutcomes)] = rng.choice([0.2, 0.5, 1])
+    cells = np.empty((programOutcomes + 1, lessonOutcomes + 1), dtype=object)
+    cells[0] = ["Prg Çıktı"] + list(range(1, lessonOutcomes + 1))
+    cells[1:, 0] = np.arange(1, programOutcomes + 1)
+    cells[1:, 1:] = relations
+    return pd.DataFrame(cells, columns=["TABLO 1", "Ders çıktısı"] + [""] * (lessonOutcomes - 1))
+
+
+def make_table_two(rng: np.random.Generator, assessmentCount: int, lessonOutcomes: int) -> pd.DataFrame:
+    """
+    Description: Builds table2 (assessment weights and lesson outcome coverage) in the input template's layout.
+    Parameters:
+        rng (np.random.Generator) : Random generator.
+        assessmentCount (int) : Number of assessments (at least 3).
+        lessonOutcomes (int) : Number of lesson outcomes (rows).
+    Returns:
+        pd.DataFrame : Table2, its first row holds the weights (sum up to 100), its second row the assessment names.
+    """
+    # Integer weights that sum up to 100, every assessment gets at least 1.
+    cuts = np.sort(rng.choice(np.arange(1, 100), size=assessmentCount - 1, replace=False))
+    weights = np.diff(np.concatenate([[0], cuts, [100]]))
+
+    # Every lesson outcome is covered by at least one assessment, otherwise its 'MAX' in table4 would be 0.
+    coverage = rng.integers(0, 2, size=(lessonOutcomes, assessmentCount))
+    uncovered = coverage.sum(axis=1) == 0
+    coverage[uncovered, rng.integers(0, assessmentCount, size=uncovered.sum())] = 1
+
+    cells = np.empty((lessonOutcomes + 2, assessmentCount + 2), dtype=object)
+    cells[0] = ["TABLO 2"] + weights.tolist() + [None]
+    cells[1] = ["Ders Çıktı"] + assessment_names(assessmentCount) + ["TOPLAM"]
+    cells[2:, 0] = np.arange(1, lessonOutcomes + 1)
+    cells[2:, 1:-1] = coverage
+    cells[2:, -1] = coverage.sum(axis=1)
+    return pd.DataFrame(cells, columns=[""] * (assessmentCount + 1) + ["TOPLAM"])
+
+
+def make_grades(rng: np.random.Generator, studentIds: np.ndarray, assessmentCount: int) -> pd.DataFrame:
+    """
+    Description: Builds the grades table in the input template's layout.
+    Parameters:
+        rng (np.random.Generator) : Random generator.
+        studentIds (np.ndarray) : Ids of the students registered to the lesson.
+        assessmentCount (int) : Number of assessments.
+    Returns:
+        pd.DataFrame : Grades table with columns 'Öğrenci' and the assessments.
+    """
+    grades = pd.DataFrame(rng.integers(0, 101, size=(len(studentIds), assessmentCount)),
+                          columns=assessment_names(assessmentCount))
+    grades.insert(0, "Öğrenci", studentIds)
+    return grades
+
+
+def generate_dataset(dataDir: str, lessons: int, students: int, assessments: int, programOutcomes: int,
+                     lessonOutcomes: int = 5, enrollment: float = 1.0, seed: int = 0) -> list:
+    """
+    Description: Creates a synthetic data folder with the same layout as 'data': lessons/<title>/table1.xlsx,
+    table2.xlsx, grades.xlsx and an empty students folder.
+    Parameters:
+        dataDir (str) : Data folder to create.
+        lessons (int) : Number of lessons (N).
+        students (int) : Number of students in the faculty (M).
+        assessments (int) : Number of assessment columns of every lesson (K, at least 3).
+        programOutcomes (int) : Number of program outcomes (P).
+        lessonOutcomes (int) : Number of lesson outcomes.
+        enrollment (float) : Share of the students registered to every lesson.
+        seed (int) : Random seed, the same arguments always create the same data.
+    Returns:
+        list : Titles of the created lessons.
+    """
+    assert assessments >= 3, "Lessons must have at least 3 assessments."
+    rng = np.random.default_rng(seed)
+    allStudents = np.arange(FIRST_STUDENT_ID, FIRST_STUDENT_ID + students)
+
+    titles = [f"SYN{lesson + 1:03d}" for lesson in range(lessons)]
+    for title in titles:
+        lessonDir = os.path.join(dataDir, "lessons", title)
+        os.makedirs(lessonDir, exist_ok=True)
+
+        registered = allStudents if enrollment >= 1 else \
+            np.sort(rng.choice(allStudents, size=max(1, int(students * enrollment)), replace=False))
+
+        write_excel(make_table_one(rng, programOutcomes, lessonOutcomes), os.path.join(lessonDir, "table1.xlsx"), "openpyxl-write-only")
+        write_excel(make_table_two(rng, assessments, lessonOutcomes), os.path.join(lessonDir, "table2.xlsx"), "openpyxl-write-only")
+        write_excel(make_grades(rng, registered, assessments), os.path.join(lessonDir, "grades.xlsx"), "openpyxl-write-only")
+
+    os.makedirs(os.path.join(dataDir, "students"), exist_ok=True)
+    return titles
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Creates a synthetic data folder (N lessons × M students × K assessments × P program outcomes).")
+    parser.add_argument("data_dir", help="Data folder to create.")
+    parser.add_argument("--lessons", type=int, default=5, help="Number of lessons (N).")
+    parser.add_argument("--students", type=int, default=1000, help="Number of students (M).")
+    parser.add_argument("--assessments", type=int, default=4, help="Number of assessment columns (K).")
+    parser.add_argument("--program-outcomes", type=int, default=10, help="Number of program outcomes (P).")
+    parser.add_argument("--lesson-outcomes", type=int, default=5, help="Number of lesson outcomes.")
+    parser.add_argument("--enrollment", type=float, default=1.0, help="Share of the students registered to every lesson.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    args = parser.parse_args()
+
+    titles = generate_dataset(args.data_dir, args.lessons, args.students, args.assessments, args.program_outcomes,
+                              args.lesson_outcomes, args.enrollment, args.seed)
+    print(f"Created {len(titles)} lessons in {args.data_dir}.")
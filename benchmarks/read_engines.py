@@ -0,0 +1,68 @@
+# ===============================================
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Make the 'src' package importable when this file is run directly as a script.
+if str(Path(__file__).parent.parent.absolute()) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+from src.reader import read_excel, READERS
+from src.writer import write_excel
+
+# Grade table sizes to measure (number of students).
+DEFAULT_ROWS = (10000, 20000, 40000)
+# ===============================================
+
+
+def make_grades(rowCount: int, assessmentCount: int = 5) -> pd.DataFrame:
+    """
+    Description: Builds a grades table in the same layout as grades.xlsx: student id, assessments, 'ORT'.
+    Parameters:
+        rowCount (int) : Number of students.
+        assessmentCount (int) : Number of assessment columns.
+    Returns:
+        pd.DataFrame : Grades table.
+    """
+    rng = np.random.default_rng(0)
+    grades = pd.DataFrame(rng.integers(0, 101, (rowCount, assessmentCount)),
+                          columns=[f"Değerlendirme {i + 1}" for i in range(assessmentCount)])
+    grades.insert(0, "Öğrenci", np.arange(200000000, 200000000 + rowCount))
+    grades["ORT"] = grades.iloc[:, 1:].mean(axis=1).round(2)
+    return grades
+
+
+def best_of(engine: str, excelPath: str, repeat: int) -> float:
+    """Returns the best wall time (seconds) of 'repeat' reads with the engine."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read_excel(excelPath, engine)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measures grades.xlsx load time of every available reader engine.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="Grade table sizes to measure.")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N reads per engine and size.")
+    args = parser.parse_args()
+
+    print(f"{'engine':>20} {'rows':>7} {'seconds':>9} {'s / 10k rows':>13}")
+    with tempfile.TemporaryDirectory() as temporaryDir:
+        for rowCount in args.rows:
+            excelPath = os.path.join(temporaryDir, f"grades_{rowCount}.xlsx")
+            write_excel(make_grades(rowCount), excelPath, "openpyxl-write-only")
+
+            # Every engine must return the same table as pandas' openpyxl reader.
+            expected = read_excel(excelPath, "openpyxl")
+            for engine in READERS:
+                assert read_excel(excelPath, engine).equals(expected), engine
+
+                seconds = best_of(engine, excelPath, args.repeat)
+                print(f"{engine:>20} {rowCount:>7} {seconds:>9.3f} {seconds / rowCount * 10000:>13.3f}")
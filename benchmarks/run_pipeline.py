@@ -0,0 +1,145 @@
+# ===============================================
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Make the 'src' package importable when this file is run directly as a script.
+ROOT_DIR = Path(__file__).parent.parent.absolute()
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from src import paths
+from src import reader as readers
+from src.reader import READERS, DEFAULT_READER
+from src.writer import BACKENDS, DEFAULT_BACKEND
+from src.instrument import peak_rss_mb, metrics_snapshot
+from benchmarks.generate import generate_dataset
+
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+# ===============================================
+
+
+def current_commit() -> str:
+    """Returns the short hash of the checked out commit, 'unknown' outside of a git repository."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Counters printed under the stage timings, a warm run is only fast because these files were not written.
+WRITE_COUNTERS = ("filesWritten", "filesUnchanged", "filesSkipped")
+
+
+def run_pipeline(dataDir: str, jobs: int = 1, writeJobs: int = 1, backend: str = None, reader: str = None,
+                 runs: int = 1, rewrite: bool = False) -> list:
+    """
+    Description: Runs the pipeline on a data folder the same way 'python -m src' does (src.main.run_full) and
+    collects the time of every stage it measures with StageTimer (load, parse, validate, model, table3, table4,
+    table5, lessonTables, studentTables, aggregate). Stages nest: table3 is part of model, and parse, validate, model,
+    table4, table5 and lessonTables are part of load. studentTables writes table4/table5 of every student.
+    The first run starts with an empty parse cache and no student tables, the next runs are warm: unchanged inputs
+    are not rewritten ('filesUnchanged') and existing student tables are kept ('filesSkipped'), unless 'rewrite' is set.
+    The pipeline copies the data folder's paths when it is imported, so a process can only benchmark one data folder.
+    Parameters:
+        dataDir (str) : Data folder with 'lessons' and 'students' folders.
+        jobs (int) : Number of processes to load and aggregate the lessons with.
+        writeJobs (int) : Number of processes to write the students' tables with.
+        backend (str) : xlsx writer backend.
+        reader (str) : xlsx reader engine.
+        runs (int) : Number of back to back runs.
+        rewrite (bool) : If True, the students' tables are removed before every run, so every run writes all of them.
+    Returns:
+        list : {"total": seconds, "stages": {stage: {"seconds", "calls"}}, "counters": dict, "parseCache": dict} of every run.
+    """
+    paths.set_data_dir(dataDir)
+
+    # Worker processes read the engine from the environment when they import the reader.
+    if reader is not None:
+        os.environ["XLSX_READER"] = reader
+        readers.DEFAULT_READER = reader
+    from src import main as pipeline
+
+    results = list()
+    for _ in range(runs):
+        if rewrite:
+            shutil.rmtree(paths.STUDENTS_DIR, ignore_errors=True)
+            os.makedirs(paths.STUDENTS_DIR)
+        pipeline.reset_run_state()
+        start = time.perf_counter()
+        pipeline.run_full(readOnly=False, jobs=jobs, writeJobs=writeJobs, excelBackend=backend)
+        total = time.perf_counter() - start
+
+        metrics = metrics_snapshot()
+        results.append({"total": total,
+                        "stages": {stage: {"seconds": seconds, "calls": metrics["stageCalls"].get(stage, 0)}
+                                   for stage, seconds in metrics["stageSeconds"].items()},
+                        "counters": metrics["counters"],
+                        "parseCache": dict(pipeline.CACHE_STATS)})
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Times every stage of the pipeline on synthetic data and records the result as JSON.")
+    parser.add_argument("--data-dir", default=None,
+                        help="Existing data folder to use (it is modified). By default synthetic data is generated into a temporary folder.")
+    parser.add_argument("--lessons", type=int, default=5, help="Number of lessons (N).")
+    parser.add_argument("--students", type=int, default=200, help="Number of students (M).")
+    parser.add_argument("--assessments", type=int, default=4, help="Number of assessment columns (K).")
+    parser.add_argument("--program-outcomes", type=int, default=10, help="Number of program outcomes (P).")
+    parser.add_argument("--lesson-outcomes", type=int, default=5, help="Number of lesson outcomes.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of processes to load and aggregate the lessons with.")
+    parser.add_argument("--write-jobs", type=int, default=1, help="Number of processes to write the students' tables with.")
+    parser.add_argument("--runs", type=int, default=2, help="Number of back to back runs, the first one is cold and the next ones are warm.")
+    parser.add_argument("--rewrite", action="store_true",
+                        help="Remove the students' tables before every run, so warm runs write them again instead of skipping them.")
+    parser.add_argument("--xlsx-backend", choices=list(BACKENDS), default=DEFAULT_BACKEND, help="xlsx writer backend.")
+    parser.add_argument("--xlsx-reader", choices=list(READERS), default=DEFAULT_READER, help="xlsx reader engine.")
+    parser.add_argument("--output", default=None, help="JSON file to write (default: benchmarks/results/<commit>.json).")
+    args = parser.parse_args()
+
+    dataDir = args.data_dir or tempfile.mkdtemp(prefix="grading-benchmark-")
+    try:
+        if args.data_dir is None:
+            generate_dataset(dataDir, args.lessons, args.students, args.assessments, args.program_outcomes,
+                             args.lesson_outcomes, seed=args.seed)
+
+        runs = run_pipeline(dataDir, args.jobs, args.write_jobs, args.xlsx_backend, args.xlsx_reader, args.runs, args.rewrite)
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(dataDir, ignore_errors=True)
+
+    commit = current_commit()
+    report = {
+        "commit": commit,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                    "numpy": np.__version__, "pandas": pd.__version__},
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        "peakRssMb": peak_rss_mb(),
+        "runs": runs,
+    }
+
+    outputPath = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(outputPath)), exist_ok=True)
+    with open(outputPath, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=1)
+
+    stages = list(dict.fromkeys(stage for run in runs for stage in run["stages"]))
+    print(f"{'stage':>14}" + "".join(f" {f'run {number}':>9}" for number in range(1, len(runs) + 1)))
+    for stage in stages:
+        print(f"{stage:>14}" + "".join(f" {run['stages'].get(stage, {'seconds': 0.0})['seconds']:>9.3f}" for run in runs))
+    for counter in WRITE_COUNTERS:
+        print(f"{counter:>14}" + "".join(f" {run['counters'].get(counter, 0):>9d}" for run in runs))
+    print(f"{'total':>14}" + "".join(f" {run['total']:>9.3f}" for run in runs) + f"  -> {outputPath}")
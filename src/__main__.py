@@ -0,0 +1,124 @@
+# ===============================================
+import os
+import time
+import logging
+import argparse
+import contextlib
+
+from src import paths
+from src.writer import BACKENDS, DEFAULT_BACKEND
+# ===============================================
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Returns the command line parser of 'python -m src'."""
+    parser = argparse.ArgumentParser(prog="python -m src",
+                                     description="Creates table3, table4 and table5 of every lesson (or of the selected lessons/students).")
+    parser.add_argument("--data-dir", default=None,
+                        help=f"Data folder with 'lessons' and 'students' folders (default: {paths.DATA_DIR_VARIABLE} "
+                             f"environment variable or 'data' next to 'src').")
+    parser.add_argument("--lesson", action="append", default=None, metavar="TITLE",
+                        help="Only process this lesson, can be given more than once (default: every lesson).")
+    parser.add_argument("--student", action="append", default=None, metavar="ID",
+                        help="Only write this student's tables and aggregate their lessons, can be given more than once.")
+    parser.add_argument("--no-aggregate", action="store_true",
+                        help="Don't aggregate the students' tables into the lessons' table4/table5.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Load and validate the lessons and report what would be written, without writing any table.")
+    parser.add_argument("--read-only", action="store_true",
+                        help="Never rewrite table1/table2/grades.xlsx, keep derived columns in memory.")
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("--incremental", action="store_true",
+                       help="Recompute only the lessons and students whose inputs or outputs changed (implies --read-only).")
+    modes.add_argument("--stream", action="store_true",
+                       help="Process one lesson at a time (load, compute, write, aggregate, release) to bound memory.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Number of processes to load and aggregate the lessons with (default: number of cores).")
+    parser.add_argument("--write-jobs", type=int, default=None,
+                        help="Number of processes to write the students' tables with (default: same as --jobs).")
+    parser.add_argument("--xlsx-backend", choices=list(BACKENDS), default=DEFAULT_BACKEND,
+                        help="xlsx writer backend (default: XLSX_BACKEND environment variable or openpyxl). "
+                             "'openpyxl-write-only' and 'xlsxwriter' stream rows with flat memory.")
+    parser.add_argument("--lock-timeout", type=float, default=None,
+                        help="Seconds to wait while another run is writing into the data folder (default: wait until it finishes).")
+    parser.add_argument("--report", default=None,
+                        help="JSON file to write the run report into (stage times, counters, profiling results). "
+                             "Default: <data-dir>/.cache/run_report.json, not written in dry runs.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the run with cProfile, the most expensive functions are added to the report.")
+    parser.add_argument("--profile-output", default=None,
+                        help="Also dump the raw cProfile stats into this file (implies --profile).")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Trace allocations with tracemalloc, peak traced memory and top allocation sites are added to the report.")
+    return parser
+
+
+def main(argv: list = None) -> None:
+    """
+    Description: Command line entry point, parses the arguments and runs the pipeline in the selected mode.
+    Parameters:
+        argv (list): Command line arguments, sys.argv[1:] if None.
+    Returns:
+        None
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.write_jobs is None:
+        args.write_jobs = args.jobs
+
+    if args.incremental and (args.student or args.dry_run):
+        parser.error("--student and --dry-run can't be used with --incremental, it finds the stale students itself.")
+    if args.stream and args.dry_run:
+        parser.error("--dry-run can't be used with --stream.")
+
+    if args.data_dir is not None:
+        if not os.path.isdir(os.path.join(args.data_dir, "lessons")):
+            parser.error(f"'{args.data_dir}' has no 'lessons' folder.")
+        paths.set_data_dir(args.data_dir)
+
+    # The pipeline copies the data folder's paths when it is imported, so it is imported after '--data-dir' is applied.
+    from src import main as pipeline
+    from src.instrument import Profiler, build_run_report, write_run_report
+    from src.datalock import DataDirLock, DataDirLockedError
+    from src.cache import prune_cache
+
+    unknownLessons = sorted(set(args.lesson or ()) - set(pipeline.LESSON_NAMES))
+    if unknownLessons:
+        parser.error(f"Unknown lesson(s): {', '.join(unknownLessons)}. Lessons in {paths.LESSONS_DIR}: "
+                     f"{', '.join(pipeline.LESSON_NAMES)}")
+    studentIDs = {str(studentID).strip() for studentID in args.student} if args.student else None
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Only one run writes into the data folder at a time (other CLI runs, the UI), a dry run writes nothing.
+    writeLock = contextlib.nullcontext() if args.dry_run else DataDirLock(paths.CACHE_DIR, args.lock_timeout)
+
+    # cProfile and tracemalloc only see this process, not the worker processes.
+    start = time.perf_counter()
+    try:
+        with writeLock, Profiler(cpu=args.profile or args.profile_output is not None, memory=args.trace_memory,
+                                 profilePath=args.profile_output) as profiler:
+            if args.incremental:
+                pipeline.run_incremental(args.jobs, args.write_jobs, args.xlsx_backend, args.lesson, not args.no_aggregate)
+            elif args.stream:
+                pipeline.run_streaming(args.read_only, args.write_jobs, args.xlsx_backend, args.lesson, studentIDs,
+                                       not args.no_aggregate)
+            else:
+                pipeline.run_full(args.read_only, args.jobs, args.write_jobs, args.xlsx_backend, args.lesson, studentIDs,
+                                  not args.no_aggregate, args.dry_run)
+
+            # Entries of deleted or renamed workbooks would stay in the cache forever, they are removed under the lock.
+            if not args.dry_run:
+                logging.info("Parse cache: %d stale entries removed.", prune_cache())
+    except DataDirLockedError as e:
+        parser.exit(1, f"{e}\n")
+
+    if args.dry_run and args.report is None:
+        return
+    report = build_run_report(time.perf_counter() - start, vars(args), profiler,
+                              {"parseCache": dict(pipeline.CACHE_STATS), "inputReads": sum(pipeline.READ_COUNTS.values())})
+    write_run_report(report, args.report or os.path.join(paths.CACHE_DIR, "run_report.json"))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,62 +1,193 @@
 # ===============================================
 import os
+import sys
+import argparse
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
-ROOT_DIR = Path(__file__).parent.parent.absolute()
-DATA_DIR = rf'{ROOT_DIR}\data'
-STUDENTS_DIR = os.path.join(DATA_DIR, "students")
-LESSONS_DIR = os.path.join(DATA_DIR, "lessons")
+# Make the 'src' package importable when this file is run directly as a script.
+if str(Path(__file__).parent.parent.absolute()) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+from src.cache import read_excel_cached
+from src.writer import write_excel, BACKENDS, DEFAULT_BACKEND
+from src.instrument import StageTimer, metrics_snapshot, merge_metrics, reset_metrics
+from src.paths import STUDENTS_DIR, LESSONS_DIR
 # ===============================================
 
 
-def aggregate():
-    # Tüm ders klasörlerini al
-    lesson_dirs = [d for d in os.listdir(LESSONS_DIR) if os.path.isdir(os.path.join(LESSONS_DIR, d))]
-
-    for lesson in lesson_dirs:
-        # Birleştirilmiş tablolar için boş liste
-        aggregated_table4 = []
-        aggregated_table5 = []
-
-        # Öğrenci klasörlerini dolaş
-        for student in os.listdir(STUDENTS_DIR):
-            student_path = os.path.join(STUDENTS_DIR, student, lesson)
-            if os.path.exists(student_path):
-                table4_path = os.path.join(student_path, "table4.xlsx")
-                table5_path = os.path.join(student_path, "table5.xlsx")
-
-                # Eğer tablo4 mevcutsa, oku ve öğrenci numarası ile birlikte birleştir
-                if os.path.exists(table4_path):
-                    table4_data = pd.read_excel(table4_path)
-                    table4_data.insert(0, "Öğrenci No", student)  # Öğrenci numarasını ekle
-                    aggregated_table4.append(table4_data)
-                    aggregated_table4.append(pd.DataFrame([[""] * len(table4_data.columns)], columns=table4_data.columns))  # Boş satır ekle
-
-                # Eğer tablo5 mevcutsa, oku ve öğrenci numarası ile birlikte birleştir
-                if os.path.exists(table5_path):
-                    table5_data = pd.read_excel(table5_path)
-                    table5_data.insert(0, "Öğrenci No", student)  # Öğrenci numarasını ekle
-                    table5_column_count = len(table5_data.columns)
-                    aggregated_table5.append(table5_data)
-                    aggregated_table5.append(pd.DataFrame(columns=[""] * len(table5_data.columns)))  # Boş satır ekle
-
-        # Birleştirilen tablo4'ü oluştur
-        if aggregated_table4:
-            final_table4 = pd.concat(aggregated_table4, ignore_index=True)
-            final_table4_path = os.path.join(LESSONS_DIR, lesson, "table4.xlsx")
-            final_table4.to_excel(final_table4_path, index=False)
-
-        # Birleştirilen tablo5'i oluştur
-        merged_df = pd.DataFrame(columns=[str(i + 1) for i in range(table5_column_count)])
-        if aggregated_table5:
-            for table5 in aggregated_table5:
-                column_names_row = pd.DataFrame([table5.columns], columns=merged_df.columns)
-                df_reset = pd.DataFrame(table5.values, columns=merged_df.columns)
-                merged_df = pd.concat([merged_df, column_names_row, df_reset], ignore_index=True)
-
-            final_table5_path = os.path.join(LESSONS_DIR, lesson, "table5.xlsx")
-            merged_df.to_excel(final_table5_path, index=False)
+def _as_read_back(df: pd.DataFrame) -> pd.DataFrame:
+    # Diskten okunan tablolarla aynı başlıkları üret: tam sayı olan float başlıklar int olarak okunur,
+    # tekrar eden başlıklara da pandas ".1", ".2" ekler (örn. tablo5'teki aynı 'Başarı' değerleri).
+    columns = []
+    seen = {}
+    for column in df.columns:
+        if isinstance(column, float) and column.is_integer():
+            column = int(column)
+        if column in seen:
+            seen[column] += 1
+            column = f"{column}.{seen[column]}"
+        else:
+            seen[column] = 0
+        columns.append(column)
+
+    df = df.copy()
+    df.columns = columns
+    return df
+
+
+def find_lesson_students(lesson_dirs: list) -> dict:
+    # Öğrenci klasörlerini bir kez dolaş, her öğrencinin kayıtlı olduğu dersler kendi klasöründeki ders klasörleridir.
+    # Her öğrenci × ders çifti için os.path.exists çağırmak yerine öğrenci başına tek bir os.scandir yeterli.
+    lesson_students = {lesson: [] for lesson in lesson_dirs}
+
+    # Öğrenciler sıralı dolaşılır, böylece çıktı her işletim sisteminde aynı olur
+    for student in sorted(entry.name for entry in os.scandir(STUDENTS_DIR) if entry.is_dir()):
+        with os.scandir(os.path.join(STUDENTS_DIR, student)) as entries:
+            for entry in entries:
+                if entry.name in lesson_students and entry.is_dir():
+                    lesson_students[entry.name].append(student)
+
+    return lesson_students
+
+
+def _read_if_exists(table_path: str):
+    # Eğer tablo mevcut değilse None döndür
+    # Çıktılar girdi değildir: önbelleğe kaydedilmez ve önbellek istatistiklerine sayılmaz
+    try:
+        return read_excel_cached(table_path, save=False, countStats=False)
+    except FileNotFoundError:
+        return None
+
+
+def read_student_tables(lesson: str, students: list) -> list:
+    # Dersin öğrencilerinin tablo4/tablo5 dosyalarını diskten oku (aggregate.py tek başına çalıştırıldığında kullanılır)
+    student_tables = []
+
+    for student in students:
+        student_path = os.path.join(STUDENTS_DIR, student, lesson)
+        table4_data = _read_if_exists(os.path.join(student_path, "table4.xlsx"))
+        table5_data = _read_if_exists(os.path.join(student_path, "table5.xlsx"))
+        student_tables.append((student, table4_data, table5_data))
+
+    return student_tables
+
+
+def collect_student_tables(table_four_result, table_five_result) -> list:
+    # main.py'nin hesapladığı tablo4/tablo5 sonuçlarını bellekten al, dosyaları tekrar okumaya gerek yok
+    student_tables = []
+
+    # Diskten okumayla aynı sırada: öğrenci numarasına göre sıralı
+    for student in sorted(table_four_result.studentRows):
+        row = table_four_result.studentRows[student]
+        table4_data = _as_read_back(table_four_result.student_frame(row))
+        table5_data = _as_read_back(table_five_result.student_frame(row))
+        student_tables.append((student, table4_data, table5_data))
+
+    return student_tables
+
+
+def merge_table5(aggregated_table5: list) -> pd.DataFrame:
+    # Her öğrencinin tablo5'i: başlık satırı + değerler, ayırıcı boş tablolar sadece "" başlık satırı ekler.
+    # Tüm satırlar tek bir object dizisinde toplanır ve DataFrame bir kez oluşturulur,
+    # her öğrencide birikmiş tabloyu tekrar kopyalayan pd.concat döngüsü öğrenci sayısının karesiyle büyüyordu.
+    blocks = []
+    for table5 in aggregated_table5:
+        blocks.append(np.array([table5.columns.tolist()], dtype=object))
+        blocks.append(table5.to_numpy(dtype=object))
+
+    table5_column_count = aggregated_table5[0].shape[1]
+    return pd.DataFrame(np.concatenate(blocks), columns=[str(i + 1) for i in range(table5_column_count)], dtype=object)
+
+
+def aggregate_lesson(lesson: str, student_tables: list, backend: str = None, lessons_dir: str = LESSONS_DIR):
+    # Birleştirilmiş tablolar için boş liste
+    aggregated_table4 = []
+    aggregated_table5 = []
+
+    for student, table4_data, table5_data in student_tables:
+        # Eğer tablo4 mevcutsa, öğrenci numarası ile birlikte birleştir
+        if table4_data is not None:
+            table4_data = table4_data.copy()
+            table4_data.insert(0, "Öğrenci No", student)  # Öğrenci numarasını ekle
+            aggregated_table4.append(table4_data)
+            aggregated_table4.append(pd.DataFrame([[""] * len(table4_data.columns)], columns=table4_data.columns))  # Boş satır ekle
+
+        # Eğer tablo5 mevcutsa, öğrenci numarası ile birlikte birleştir
+        if table5_data is not None:
+            table5_data = table5_data.copy()
+            table5_data.insert(0, "Öğrenci No", student)  # Öğrenci numarasını ekle
+            aggregated_table5.append(table5_data)
+            aggregated_table5.append(pd.DataFrame(columns=[""] * len(table5_data.columns)))  # Boş satır ekle
+
+    # Birleştirilen tablo4'ü oluştur
+    if aggregated_table4:
+        final_table4 = pd.concat(aggregated_table4, ignore_index=True)
+        final_table4_path = os.path.join(lessons_dir, lesson, "table4.xlsx")
+        write_excel(final_table4, final_table4_path, backend)
+
+    # Birleştirilen tablo5'i oluştur
+    if aggregated_table5:
+        merged_df = merge_table5(aggregated_table5)
+        final_table5_path = os.path.join(lessons_dir, lesson, "table5.xlsx")
+        write_excel(merged_df, final_table5_path, backend)
+
+
+def _aggregate_from_disk(lesson: str, students: list, backend: str = None):
+    # İşçi süreçte çalışır: öğrenci dosyalarını okuyup dersin tablolarını yazar
+    aggregate_lesson(lesson, read_student_tables(lesson, students), backend)
+
+
+def _aggregate_from_results(lesson: str, table_four_result, table_five_result, backend: str = None):
+    # İşçi süreçte çalışır: main.py'nin hesapladığı sonuçlardan dersin tablolarını yazar
+    aggregate_lesson(lesson, collect_student_tables(table_four_result, table_five_result), backend)
+
+
+def _run_in_worker(function, *arguments):
+    # İşçi süreç birden fazla ders alabilir, sadece bu dersin ölçümlerini ana sürece gönder
+    reset_metrics()
+    function(*arguments)
+    return metrics_snapshot()
+
+
+@StageTimer("aggregate")
+def aggregate(lesson_titles: list = None, lesson_objects: list = None, jobs: int = 1, backend: str = None):
+    # main.py ders nesnelerini verdiyse sonuçları bellekten birleştir
+    if lesson_objects is not None:
+        tasks = [(_aggregate_from_results, lesson_obj.title, lesson_obj.tableFourResult, lesson_obj.tableFiveResult, backend)
+                 for lesson_obj in lesson_objects]
+
+    else:
+        # Tüm ders klasörlerini al (ders isimleri verildiyse sadece onları)
+        lesson_dirs = [d for d in os.listdir(LESSONS_DIR) if os.path.isdir(os.path.join(LESSONS_DIR, d))]
+        if lesson_titles:
+            lesson_dirs = [d for d in lesson_dirs if d in lesson_titles]
+
+        # Diskteki öğrenci tablolarını okuyup birleştir
+        lesson_students = find_lesson_students(lesson_dirs)
+        tasks = [(_aggregate_from_disk, lesson, lesson_students[lesson], backend) for lesson in lesson_dirs]
+
+    # Tek işçi ya da tek ders varsa süreç havuzu açmaya değmez
+    if jobs <= 1 or len(tasks) <= 1:
+        for function, *arguments in tasks:
+            function(*arguments)
+        return
+
+    # Dersler birbirinden bağımsız, her ders ayrı bir süreçte birleştirilip yazılır
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+        futures = [executor.submit(_run_in_worker, function, *arguments) for function, *arguments in tasks]
+
+        # Hata olduysa burada yükselt, işçilerin ölçümlerini ana sürecinkilerle birleştir
+        for future in futures:
+            merge_metrics(future.result())
 
 if __name__ == "__main__":
-    aggregate()
+    # Komut satırından ders isimleri verilebilir: python aggregate.py BLM001 BLM002 --jobs 4
+    parser = argparse.ArgumentParser(description="Öğrenci tablo4/tablo5 dosyalarını ders tablolarında birleştirir.")
+    parser.add_argument("lessons", nargs="*", help="Birleştirilecek dersler (varsayılan: hepsi).")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Paralel süreç sayısı.")
+    parser.add_argument("--xlsx-backend", choices=list(BACKENDS), default=DEFAULT_BACKEND, help="xlsx yazıcı.")
+    args = parser.parse_args()
+    aggregate(args.lessons, jobs=args.jobs, backend=args.xlsx_backend)
@@ -0,0 +1,170 @@
+# ===============================================
+import os
+import json
+import hashlib
+import zipfile
+import numpy as np
+import pandas as pd
+from collections import Counter
+
+from src.reader import read_excel
+from src import paths
+
+# Cache hits and misses of this run.
+CACHE_STATS = Counter()
+# ===============================================
+
+
+def file_hash(excelPath: str) -> str:
+    """
+    Description: Calculates the sha1 hash of a file's content.
+    Parameters:
+        excelPath (str) : Path to the file.
+    Returns:
+        str : Hex digest of the content.
+    """
+    sha1 = hashlib.sha1()
+    with open(excelPath, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _entry_path(excelPath: str) -> str:
+    """Returns the cache file of a workbook, cache files are named after the hash of the workbook's absolute path."""
+    key = hashlib.sha1(os.path.abspath(excelPath).encode("utf-8")).hexdigest()
+    return os.path.join(paths.CACHE_DIR, f"{key}.npz")
+
+
+def _load_entry(entryPath: str) -> tuple:
+    """
+    Description: Loads a cache entry.
+    Parameters:
+        entryPath (str) : Path to the .npz cache file.
+    Returns:
+        tuple : (meta (dict), df (pd.DataFrame)) or (None, None) if the entry does not exist or can't be read.
+    """
+    if not os.path.exists(entryPath):
+        return None, None
+
+    try:
+        with np.load(entryPath, allow_pickle=True) as entry:
+            meta = json.loads(str(entry["__meta__"]))
+            columns = entry["__columns__"].tolist()
+
+            # Every column is stored as its own array, restore them with their original dtypes.
+            df = pd.DataFrame({position: entry[f"c{position}"] for position in range(len(columns))})
+            df = df.astype({position: dtype for position, dtype in enumerate(meta["dtypes"])})
+            df.columns = columns
+            return meta, df
+
+    # A broken entry is just a cache miss.
+    except (OSError, ValueError, KeyError, TypeError, zipfile.BadZipFile):
+        return None, None
+
+
+def _save_entry(entryPath: str, meta: dict, df: pd.DataFrame) -> None:
+    """
+    Description: Saves a dataframe as a columnar .npz cache entry, the file is replaced atomically.
+    Parameters:
+        entryPath (str) : Path to the .npz cache file.
+        meta (dict) : Workbook's fingerprint (path, mtime, size and content hash).
+        df (pd.DataFrame) : Parsed workbook.
+    Returns:
+        None
+    """
+    meta = dict(meta, dtypes=[str(dtype) for dtype in df.dtypes])
+    arrays = {f"c{position}": df.iloc[:, position].to_numpy() for position in range(df.shape[1])}
+    arrays["__columns__"] = np.array(df.columns.tolist(), dtype=object)
+    arrays["__meta__"] = np.array(json.dumps(meta))
+
+    try:
+        os.makedirs(paths.CACHE_DIR, exist_ok=True)
+
+        # Write into a temporary file first, so a concurrent reader never sees a half-written entry.
+        temporaryPath = paths.temporary_path(entryPath)
+        try:
+            with open(temporaryPath, "wb") as file:
+                np.savez(file, **arrays)
+            os.replace(temporaryPath, entryPath)
+        finally:
+            if os.path.exists(temporaryPath):
+                os.remove(temporaryPath)
+
+    # The cache is only an optimization, a read-only data folder must not break the run.
+    except OSError:
+        pass
+
+
+def read_excel_cached(excelPath: str, save: bool = True, countStats: bool = True) -> pd.DataFrame:
+    """
+    Description: Reads the first sheet of a workbook, using the parsed copy in the cache if the workbook didn't change.
+    A workbook is unchanged if its mtime and size are the same, or if its content hash is the same.
+    Parameters:
+        excelPath (str) : Path to the xlsx file.
+        save (bool) : If False, the cache is only read, e.g. in dry runs that must not write into the data folder.
+        countStats (bool) : If False, the read is not counted in CACHE_STATS, e.g. when an output is read back.
+    Returns:
+        pd.DataFrame : Parsed sheet, same as pd.read_excel(excelPath, sheet_name=0).
+    """
+    stat = os.stat(excelPath)
+    entryPath = _entry_path(excelPath)
+    meta, df = _load_entry(entryPath)
+
+    # Fast path, the file wasn't touched since it was cached.
+    if meta is not None and meta["mtime"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+        CACHE_STATS["hits"] += countStats
+        return df
+
+    # The file was touched, but its content may still be the same (copied or rewritten with the same data).
+    contentHash = file_hash(excelPath)
+    fingerprint = {"path": os.path.abspath(excelPath), "mtime": stat.st_mtime_ns, "size": stat.st_size, "sha1": contentHash}
+
+    if meta is not None and meta["sha1"] == contentHash:
+        CACHE_STATS["hits"] += countStats
+
+    # Cache miss, parse the workbook with the fastest available reader engine.
+    else:
+        CACHE_STATS["misses"] += countStats
+        df = read_excel(excelPath)
+
+    # Save the entry with the new fingerprint, so the next run can use the fast path.
+    if save:
+        _save_entry(entryPath, fingerprint, df)
+    return df
+
+
+def prune_cache() -> int:
+    """
+    Description: Removes the cache entries of workbooks that no longer exist (deleted or renamed lessons and students)
+    or that are not in the data folder (e.g. uploaded files that were validated, or a copied data folder).
+    Unreadable entries are removed too, they could only ever be cache misses.
+    It deletes files in the data folder, so it must run under the data folder's lock.
+    Parameters:
+        None
+    Returns:
+        int : Number of removed entries.
+    """
+    if not os.path.isdir(paths.CACHE_DIR):
+        return 0
+
+    dataDir = os.path.join(paths.DATA_DIR, "")
+    removed = 0
+    for entry in os.scandir(paths.CACHE_DIR):
+        # Temporary files of an entry that is being saved end with '.tmp.npz', they are not entries yet.
+        if not entry.name.endswith(".npz") or entry.name.endswith(".tmp.npz"):
+            continue
+
+        try:
+            with np.load(entry.path, allow_pickle=True) as data:
+                sourcePath = json.loads(str(data["__meta__"]))["path"]
+        except (OSError, ValueError, KeyError, TypeError, zipfile.BadZipFile):
+            sourcePath = None
+
+        if sourcePath is None or not sourcePath.startswith(dataDir) or not os.path.exists(sourcePath):
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
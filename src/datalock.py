@@ -0,0 +1,188 @@
+# ===============================================
+import os
+import sys
+import time
+import uuid
+import socket
+import logging
+import threading
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+LOGGER = logging.getLogger(__name__)
+
+# Name of the lock file in the cache folder.
+LOCK_FILE_NAME = "write.lock"
+# Seconds between two attempts to take a busy lock.
+POLL_INTERVAL = 0.2
+# ===============================================
+
+
+class DataDirLockedError(TimeoutError):
+    """Raised when another run kept the data folder locked for longer than the timeout."""
+
+
+def _process_exists(pid: int) -> bool:
+    """
+    Description: Checks if a process is still running, a lock left behind by a crashed run can be taken over.
+    Parameters:
+        pid (int) : Process id.
+    Returns:
+        bool : True if the process exists or if it can't be checked on this platform.
+    """
+    if psutil is not None:
+        return psutil.pid_exists(pid)
+
+    # On Windows os.kill() would terminate the process, without psutil the owner is assumed to be alive.
+    if sys.platform == "win32":
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class DataDirLock:
+    """
+    Description: Inter-process lock that lets a single run write into the data folder at a time (CLI runs and the UI).
+    The lock is a file created with O_EXCL that holds the owner's host, process id and a token unique to the lock.
+    A lock whose owner process is gone on this host is taken over, by a single process even if several find it stale.
+
+    Attributes:
+        lockPath (str) : Path to the lock file.
+        timeout (float) : Seconds to wait for a busy lock, None waits forever.
+
+    Member Functions:
+        _try_acquire (self: DataDirLock) -> bool: Creates the lock file if it doesn't exist.
+        _owner (self: DataDirLock, lockPath: str) -> tuple: Reads the (host, pid, token) of a lock file.
+        _take_over (self: DataDirLock, staleOwner: tuple) -> None: Removes a stale lock, unless another process already replaced it.
+        acquire (self: DataDirLock) -> None: Waits until the lock is taken.
+        release (self: DataDirLock) -> None: Removes the lock file.
+    """
+
+    def __init__(self, cacheDir: str, timeout: float = None):
+        self.lockPath = os.path.join(cacheDir, LOCK_FILE_NAME)
+        self.timeout = timeout
+        self._held = False
+        self._token = uuid.uuid4().hex
+
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback) -> None:
+        self.release()
+
+
+    def _try_acquire(self) -> bool:
+        """Creates the lock file, returns False if it already exists."""
+        try:
+            descriptor = os.open(self.lockPath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(descriptor, "w") as file:
+            file.write(f"{socket.gethostname()} {os.getpid()} {self._token}")
+        return True
+
+
+    def _owner(self, lockPath: str = None) -> tuple:
+        """Returns (host, pid, token) of a lock file (the lock by default), (None, None, None) if it is gone or unreadable."""
+        try:
+            with open(lockPath or self.lockPath) as file:
+                fields = file.read().split()
+            # Locks written by older versions have no token.
+            host, pid, token = (fields + [""])[:3] if len(fields) in (2, 3) else (None, None, None)
+            return host, int(pid), token
+        except (OSError, ValueError, TypeError):
+            return None, None, None
+
+
+    def _take_over(self, staleOwner: tuple) -> None:
+        """
+        Description: Removes a lock whose owner is gone. Several processes may find the same stale lock, and one of
+        them may already have taken it over and created a new lock, which must not be removed. So the lock is first
+        moved to a name only this process uses (a rename is atomic, a single process moves a given file) and removed
+        only if it is still the stale one. Otherwise the new owner's lock is put back.
+        Parameters:
+            staleOwner (tuple) : (host, pid, token) read from the stale lock.
+        Returns:
+            None
+        """
+        movedPath = f"{self.lockPath}.{os.getpid()}.{threading.get_ident()}.stale"
+        try:
+            os.replace(self.lockPath, movedPath)
+        except FileNotFoundError:
+            return
+
+        try:
+            if self._owner(movedPath) == staleOwner:
+                LOGGER.warning("Removed the stale lock of process %d: %s", staleOwner[1], self.lockPath)
+                return
+
+            # Another process took the lock over in between, give its lock back. A link fails if the name exists.
+            try:
+                os.link(movedPath, self.lockPath)
+            except FileExistsError:
+                LOGGER.error("The lock of %s:%s was replaced while it was being restored: %s",
+                             *self._owner(movedPath)[:2], self.lockPath)
+            except OSError:
+                # No hard links on this file system, a rename puts it back (it only overwrites on POSIX, in a tiny window).
+                os.rename(movedPath, self.lockPath)
+        finally:
+            if os.path.exists(movedPath):
+                os.remove(movedPath)
+
+
+    def acquire(self) -> None:
+        """
+        Description: Takes the lock, waits while another run holds it.
+        Parameters:
+            self (DataDirLock) : DataDirLock object.
+        Returns:
+            None
+        Raises:
+            DataDirLockedError : If the lock is still busy after 'timeout' seconds.
+        """
+        os.makedirs(os.path.dirname(self.lockPath), exist_ok=True)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        waiting = False
+
+        while not self._try_acquire():
+            host, pid, token = self._owner()
+
+            # The owner crashed without removing the lock, take it over.
+            if host == socket.gethostname() and pid is not None and pid != os.getpid() and not _process_exists(pid):
+                self._take_over((host, pid, token))
+                continue
+
+            if deadline is not None and time.monotonic() >= deadline:
+                raise DataDirLockedError(f"The data folder is locked by {host}:{pid} ({self.lockPath}). "
+                                         f"If no other run is active, remove the lock file.")
+            if not waiting:
+                LOGGER.info("Waiting for the run of %s:%s to finish writing...", host, pid)
+                waiting = True
+            time.sleep(POLL_INTERVAL)
+
+        self._held = True
+
+
+    def release(self) -> None:
+        """Removes the lock file if this object holds it, a lock that was taken over by another process is left alone."""
+        if self._held:
+            self._held = False
+            if self._owner()[2] != self._token:
+                LOGGER.error("The lock was taken over by another process while it was held: %s", self.lockPath)
+                return
+            try:
+                os.remove(self.lockPath)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,168 @@
+# ===============================================
+import numpy as np
+import pandas as pd
+# ===============================================
+
+
+class TableFourResult:
+    """
+    Description: Table4 of every student of a lesson, computed at once.
+
+    Attributes:
+        studentRows (dict) : Maps student id (str) to its row in the result arrays.
+        columnDersCikti (list) : Column 'Ders Çıktı' of table4.
+        gradeColumns (list) : Names of the assessment columns (Öd1, Vize, ...).
+        cells (np.ndarray) : Weighted grades, shape (students × Ders Çıktı × assessments).
+        toplam (np.ndarray) : Column 'TOPLAM' of every student, shape (students × Ders Çıktı).
+        columnMax (np.ndarray) : Column 'MAX', same for every student, shape (Ders Çıktı,).
+        basari (np.ndarray) : Column 'Başarı' of every student, shape (students × Ders Çıktı).
+
+    Member Functions:
+        student_frame (self: TableFourResult, row: int) -> pd.DataFrame: Slices a student's table4.
+    """
+
+    def __init__(self, studentRows: dict, columnDersCikti: list, gradeColumns: list,
+                 cells: np.ndarray, toplam: np.ndarray, columnMax: np.ndarray, basari: np.ndarray):
+        self.studentRows = studentRows
+        self.columnDersCikti = columnDersCikti
+        self.gradeColumns = gradeColumns
+        self.cells = cells
+        self.toplam = toplam
+        self.columnMax = columnMax
+        self.basari = basari
+
+
+    def student_frame(self, row: int) -> pd.DataFrame:
+        """
+        Description: Builds the table4 dataframe of a single student from the lesson-level arrays.
+        Parameters:
+            row (int) : Student's row in the lesson's grades table (see studentRows).
+        Returns:
+            pd.DataFrame : Student's table4 with columns 'Ders Çıktı', assessments, 'TOPLAM', 'MAX' and 'Başarı'.
+        """
+
+        # Weighted grades are the body of the table, the remaining columns are appended in order.
+        tableFourDataFrame = pd.DataFrame(self.cells[row], columns=self.gradeColumns)
+        tableFourDataFrame["TOPLAM"] = self.toplam[row]
+        tableFourDataFrame["MAX"] = self.columnMax
+        tableFourDataFrame["Başarı"] = self.basari[row]
+        tableFourDataFrame.insert(0, 'Ders Çıktı', self.columnDersCikti)
+
+        return tableFourDataFrame
+
+
+def compute_table_four(lessonModel) -> TableFourResult:
+    """
+    Description: Computes table4 for every student of a lesson in one batched NumPy operation.
+    Parameters:
+        lessonModel (LessonModel) : Lesson's input tables.
+    Returns:
+        TableFourResult : Arrays of every student's table4, indexed by student id.
+    """
+
+    # Table3 values and grades are already float64 arrays.
+    # weights: (Ders Çıktı × assessments), grades: (students × assessments).
+    weights = lessonModel.weighted
+    grades = lessonModel.grades
+
+    # Multiply every weight with every student's grade at once, then drop the fractions like 'astype(int)' does.
+    # The result has shape (students × Ders Çıktı × assessments).
+    cells = (weights[np.newaxis, :, :] * grades[:, np.newaxis, :]).astype(np.int64)
+
+    # Column 'TOPLAM' for every student.
+    toplam = cells.sum(axis=2)
+
+    # Column 'MAX' only depends on table3, compute it once using its 'TOPLAM' column.
+    columnToplamDf3 = lessonModel.weightedToplam.tolist()
+    columnMax = np.array([int(round(num, 3) * 100) for num in columnToplamDf3], dtype=np.int64)
+
+    # Column 'Başarı' for every student.
+    basari = np.round((toplam / columnMax) * 100, 1)
+
+    # Map every student id to its row, the first row wins if an id is repeated.
+    studentRows = dict()
+    for row, studentID in enumerate(lessonModel.studentIds):
+        studentRows.setdefault(str(studentID), row)
+
+    return TableFourResult(studentRows=studentRows,
+                           columnDersCikti=lessonModel.dersCikti,
+                           gradeColumns=lessonModel.gradesColumns[1:],
+                           cells=cells,
+                           toplam=toplam,
+                           columnMax=columnMax,
+                           basari=basari)
+
+
+class TableFiveResult:
+    """
+    Description: Table5 (program outcome achievement) of every student of a lesson, computed at once.
+
+    Attributes:
+        studentRows (dict) : Maps student id (str) to its row in the result arrays.
+        columnPrgCikti (list) : Column 'Prg Çıktı' of table5.
+        relations (np.ndarray) : Values of table1, shape (Prg Çıktı × Ders Çıktı).
+        basari (np.ndarray) : Column 'Başarı' of every student's table4, shape (students × Ders Çıktı).
+        maxBasari (np.ndarray) : Maximum achievable total of every program outcome, shape (Prg Çıktı,).
+        basariOrani (np.ndarray) : Column 'Başarı Oranı' of every student, shape (students × Prg Çıktı).
+
+    Member Functions:
+        student_frame (self: TableFiveResult, row: int) -> pd.DataFrame: Slices a student's table5.
+    """
+
+    def __init__(self, studentRows: dict, columnPrgCikti: list, relations: np.ndarray,
+                 basari: np.ndarray, maxBasari: np.ndarray, basariOrani: np.ndarray):
+        self.studentRows = studentRows
+        self.columnPrgCikti = columnPrgCikti
+        self.relations = relations
+        self.basari = basari
+        self.maxBasari = maxBasari
+        self.basariOrani = basariOrani
+
+
+    def student_frame(self, row: int) -> pd.DataFrame:
+        """
+        Description: Builds the table5 dataframe of a single student from the lesson-level arrays.
+        Parameters:
+            row (int) : Student's row in the lesson's grades table (see studentRows).
+        Returns:
+            pd.DataFrame : Student's table5. Its header is 'Prg Çıktı', the student's 'Başarı' values and 'Başarı Oranı'.
+        """
+        columnBasari = self.basari[row].tolist()
+
+        # Multiply every relation value with the student's 'Başarı' of that Ders Çıktı.
+        tableFiveDataFrame = pd.DataFrame(self.relations * self.basari[row], columns=columnBasari)
+        tableFiveDataFrame.insert(0, 'Prg Çıktı', self.columnPrgCikti)
+        tableFiveDataFrame["Başarı Oranı"] = self.basariOrani[row]
+
+        return tableFiveDataFrame
+
+
+def compute_table_five(lessonModel, tableFourResult: TableFourResult) -> TableFiveResult:
+    """
+    Description: Computes table5 for every student of a lesson as a single matrix product.
+    Parameters:
+        lessonModel (LessonModel) : Lesson's input tables.
+        tableFourResult (TableFourResult) : Lesson's table4 results.
+    Returns:
+        TableFiveResult : Arrays of every student's table5, indexed by student id.
+    """
+
+    # Table1 values, shape (Prg Çıktı × Ders Çıktı).
+    relations = lessonModel.relations
+
+    # 'MAXBASARI' is the total of a student whose every 'Başarı' is 100, so it is the same for every student.
+    maxBasari = (relations * 100).sum(axis=1)
+
+    # Total weighted 'Başarı' of every student and program outcome:
+    # (students × Ders Çıktı) @ (Ders Çıktı × Prg Çıktı) -> (students × Prg Çıktı).
+    totalBasari = np.round(tableFourResult.basari @ relations.T, 3)
+
+    # Column 'Başarı Oranı' for every student.
+    basariOrani = np.round((totalBasari / maxBasari) * 100, 1)
+
+    return TableFiveResult(studentRows=tableFourResult.studentRows,
+                           columnPrgCikti=lessonModel.prgCikti,
+                           relations=relations,
+                           basari=tableFourResult.basari,
+                           maxBasari=maxBasari,
+                           basariOrani=basariOrani)
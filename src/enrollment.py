@@ -0,0 +1,55 @@
+# ===============================================
+from collections import defaultdict
+# ===============================================
+
+
+class EnrollmentIndex:
+    """
+    Description: Dict based enrollment index, built while the lessons are loaded.
+    Replaces scanning every lesson's student list for every student.
+
+    Attributes:
+        studentLessons (defaultdict) : Student id (str) -> list of the student's Lesson objects.
+        lessonRows (dict) : Lesson title -> {student id (str): row of the student in the lesson's grades}.
+
+    Member Functions:
+        add_lesson (self: EnrollmentIndex, lesson: Lesson) -> None: Indexes a lesson's students.
+        lessons_of (self: EnrollmentIndex, studentID: int | str) -> list: Returns the lessons of a student.
+        row_of (self: EnrollmentIndex, lessonTitle: str, studentID: int | str) -> int: Returns a student's row in a lesson.
+        student_ids (self: EnrollmentIndex) -> list: Returns every indexed student id.
+    """
+
+    def __init__(self):
+        self.studentLessons = defaultdict(list)
+        self.lessonRows = dict()
+
+
+    def add_lesson(self, lesson) -> None:
+        """
+        Description: Indexes every student registered to the lesson.
+        Parameters:
+            lesson (Lesson) : Loaded lesson object.
+        Returns:
+            None
+        """
+
+        # Rows are already mapped by the lesson's table4 engine, share the same dict.
+        self.lessonRows[lesson.title] = lesson.tableFourResult.studentRows
+
+        for studentID in self.lessonRows[lesson.title]:
+            self.studentLessons[studentID].append(lesson)
+
+
+    def lessons_of(self, studentID) -> list:
+        """Returns the lessons that the student is registered to, in loading order."""
+        return self.studentLessons.get(str(studentID), list())
+
+
+    def row_of(self, lessonTitle: str, studentID) -> int:
+        """Returns the student's row in the lesson's grades table."""
+        return self.lessonRows[lessonTitle][str(studentID)]
+
+
+    def student_ids(self) -> list:
+        """Returns the id (str) of every student registered to at least one lesson."""
+        return list(self.studentLessons)
@@ -0,0 +1,82 @@
+# ===============================================
+import os
+import logging
+import pandas as pd
+from collections import Counter
+
+from src.cache import read_excel_cached, CACHE_STATS
+from src.instrument import StageTimer
+
+# Number of times every input workbook is parsed during this run, keyed by file path.
+READ_COUNTS = Counter()
+LOGGER = logging.getLogger(__name__)
+
+# Columns that older runs wrote into the input workbooks, they have to be recalculated from the raw values.
+# Table2's 'TOPLAM' column is not listed, it is part of the input template and is always recalculated in place.
+DERIVED_COLUMNS = {"tableOne": "İlişki Değeri", "tableGrades": "ORT"}
+# ===============================================
+
+
+@StageTimer("parse")
+def read_input_table(excelPath: str, saveCache: bool = True) -> pd.DataFrame:
+    """
+    Description: Reads the first sheet of an input workbook (from the parse cache if possible) and counts the read.
+    Parameters:
+        excelPath (str) : Path to the xlsx file.
+        saveCache (bool) : If False, the parse cache is only read, not updated.
+    Returns:
+        pd.DataFrame : Parsed sheet.
+    """
+    READ_COUNTS[excelPath] += 1
+    LOGGER.debug("Reading %s (read #%d)", excelPath, READ_COUNTS[excelPath])
+    return read_excel_cached(excelPath, save=saveCache)
+
+
+def log_read_counts() -> None:
+    """Logs how many times every input workbook was parsed, warns about the ones that were parsed more than once."""
+    LOGGER.info("Input workbooks parsed: %d files, %d reads.", len(READ_COUNTS), sum(READ_COUNTS.values()))
+    LOGGER.info("Parse cache: %d hits, %d misses.", CACHE_STATS["hits"], CACHE_STATS["misses"])
+    for excelPath, count in READ_COUNTS.items():
+        if count > 1:
+            LOGGER.warning("%s was parsed %d times.", excelPath, count)
+
+
+class LessonInputs:
+    """
+    Description: Parsed input workbooks of a lesson. Every workbook is read exactly once.
+
+    Attributes:
+        inputFolderPath (str) : Lesson folder path.
+        tableOne (pd.DataFrame) : Parsed table1.xlsx.
+        tableTwo (pd.DataFrame) : Parsed table2.xlsx.
+        tableGrades (pd.DataFrame) : Parsed grades.xlsx.
+        saveCache (bool) : If False, the parse cache is only read, not updated (dry runs).
+
+    Member Functions:
+        _drop_derived_columns (self: LessonInputs) -> None: Removes the columns that older runs wrote into the inputs.
+    """
+
+    def __init__(self, inputFolderPath: str, dropDerived: bool = False, saveCache: bool = True):
+        self.inputFolderPath = inputFolderPath
+        self.saveCache = saveCache
+        self.tableOne = read_input_table(os.path.join(inputFolderPath, "table1.xlsx"), saveCache)
+        self.tableTwo = read_input_table(os.path.join(inputFolderPath, "table2.xlsx"), saveCache)
+        self.tableGrades = read_input_table(os.path.join(inputFolderPath, "grades.xlsx"), saveCache)
+
+        if dropDerived:
+            self._drop_derived_columns()
+
+
+    def _drop_derived_columns(self) -> None:
+        """
+        Description: Removes 'İlişki Değeri' and 'ORT' columns if an older run already wrote them into the inputs.
+        This way both are calculated from the raw inputs, no matter how many times the inputs were processed.
+        Parameters:
+            self (LessonInputs): LessonInputs object.
+        Returns:
+            None
+        """
+        for attributeName, columnName in DERIVED_COLUMNS.items():
+            df = getattr(self, attributeName)
+            if columnName in df.columns:
+                setattr(self, attributeName, df.drop(columns=columnName))
@@ -0,0 +1,247 @@
+# ===============================================
+import os
+import sys
+import json
+import time
+import pstats
+import logging
+import cProfile
+import platform
+import tracemalloc
+from collections import Counter
+from contextlib import ContextDecorator
+
+try:
+    import resource
+except ImportError:
+    # 'resource' is Unix only.
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds spent in every stage of this run and how many times the stage ran.
+# Stages that run in worker processes are merged in, so a stage's seconds can be more than the wall time.
+STAGE_SECONDS = Counter()
+STAGE_CALLS = Counter()
+
+# Work done during this run: files read/written, bytes read/written, lessons loaded, students processed, ...
+COUNTERS = Counter()
+# ===============================================
+
+
+def peak_rss_mb() -> float | None:
+    """
+    Description: Returns the peak resident set size of the current process.
+    Uses 'resource' on Unix and 'psutil' (if installed) elsewhere.
+    Parameters:
+        None
+    Returns:
+        float : Peak RSS in megabytes.
+        None : If it can't be measured on this platform.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+    if psutil is not None:
+        memoryInfo = psutil.Process().memory_info()
+
+        # On Windows 'peak_wset' is the peak working set, other platforms only report the current RSS.
+        return getattr(memoryInfo, "peak_wset", memoryInfo.rss) / (1024 * 1024)
+
+    return None
+
+
+class StageTimer(ContextDecorator):
+    """
+    Description: Adds the wall time of a block or a function to a stage, works as a context manager and as a decorator:
+        with StageTimer("write"): ...
+        @StageTimer("parse")
+        def read_input_table(...): ...
+    Nested stages are timed independently, an outer stage's time includes its inner stages.
+
+    Attributes:
+        name (str) : Stage name.
+
+    Member Functions:
+        _recreate_cm (self: StageTimer) -> StageTimer: Returns a fresh timer for every call of a decorated function.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._start = None
+
+
+    def _recreate_cm(self):
+        # A decorated function may be called recursively or from several threads, every call gets its own start time.
+        return StageTimer(self.name)
+
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback) -> bool:
+        STAGE_SECONDS[self.name] += time.perf_counter() - self._start
+        STAGE_CALLS[self.name] += 1
+        return False
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Adds 'amount' to a run counter."""
+    COUNTERS[name] += amount
+
+
+def count_file(name: str, filePath: str) -> None:
+    """
+    Description: Counts a file that was read or written and its size.
+    Parameters:
+        name (str) : 'Read' or 'Written', counters 'files<name>' and 'bytes<name>' are increased.
+        filePath (str) : Path to the file.
+    Returns:
+        None
+    """
+    COUNTERS[f"files{name}"] += 1
+    try:
+        COUNTERS[f"bytes{name}"] += os.path.getsize(filePath)
+    except OSError:
+        pass
+
+
+def metrics_snapshot() -> dict:
+    """Returns the stage times and counters of this process, so a worker process can send them back to the main process."""
+    return {"stageSeconds": dict(STAGE_SECONDS), "stageCalls": dict(STAGE_CALLS), "counters": dict(COUNTERS)}
+
+
+def merge_metrics(snapshot: dict) -> None:
+    """Adds a worker process' metrics_snapshot() into this process' stage times and counters."""
+    STAGE_SECONDS.update(snapshot["stageSeconds"])
+    STAGE_CALLS.update(snapshot["stageCalls"])
+    COUNTERS.update(snapshot["counters"])
+
+
+def reset_metrics() -> None:
+    """Clears the stage times and counters, e.g. in a reused worker process before its next task."""
+    STAGE_SECONDS.clear()
+    STAGE_CALLS.clear()
+    COUNTERS.clear()
+
+
+class Profiler:
+    """
+    Description: Optional cProfile and tracemalloc capture around a run, both are off by default because they slow it down.
+    Only the current process is profiled, work done in worker processes is not included.
+
+    Attributes:
+        cpu (bool) : If True, the run is profiled with cProfile.
+        memory (bool) : If True, allocations are traced with tracemalloc.
+        top (int) : Number of functions and allocation sites to report.
+        profilePath (str) : If given, the raw cProfile stats are dumped there (open with pstats or snakeviz).
+        results (dict) : Captured results, filled when the block exits.
+
+    Member Functions:
+        _cpu_results (self: Profiler) -> list: Most expensive functions by cumulative time.
+        _memory_results (self: Profiler) -> dict: Current/peak traced memory and the largest allocation sites.
+    """
+
+    def __init__(self, cpu: bool = False, memory: bool = False, top: int = 25, profilePath: str = None):
+        self.cpu = cpu
+        self.memory = memory
+        self.top = top
+        self.profilePath = profilePath
+        self.results = dict()
+        self._profile = cProfile.Profile() if cpu else None
+
+
+    def __enter__(self):
+        if self.memory:
+            tracemalloc.start()
+        if self._profile is not None:
+            self._profile.enable()
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback) -> bool:
+        if self._profile is not None:
+            self._profile.disable()
+            self.results["cpu"] = self._cpu_results()
+            if self.profilePath:
+                self._profile.dump_stats(self.profilePath)
+
+        if self.memory:
+            self.results["memory"] = self._memory_results()
+            tracemalloc.stop()
+        return False
+
+
+    def _cpu_results(self) -> list:
+        """Returns the 'top' functions with the highest cumulative time."""
+        stats = pstats.Stats(self._profile)
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top]
+        return [{"function": f"{fileName}:{lineNumber}({functionName})", "calls": calls,
+                 "totalSeconds": totalTime, "cumulativeSeconds": cumulativeTime}
+                for (fileName, lineNumber, functionName), (_, calls, totalTime, cumulativeTime, _) in functions]
+
+
+    def _memory_results(self) -> dict:
+        """Returns the traced memory and the 'top' allocation sites that are still alive."""
+        current, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().statistics("lineno")[:self.top]
+        return {"currentMb": current / (1024 * 1024), "peakMb": peak / (1024 * 1024),
+                "top": [{"site": str(statistic.traceback), "sizeMb": statistic.size / (1024 * 1024), "blocks": statistic.count}
+                        for statistic in statistics]}
+
+
+def build_run_report(wallSeconds: float, arguments: dict = None, profiler: Profiler = None, extra: dict = None) -> dict:
+    """
+    Description: Collects the stage times, counters and profiling results of this run into a JSON-serializable dict.
+    Parameters:
+        wallSeconds (float) : Wall time of the whole run.
+        arguments (dict) : Command line arguments of the run.
+        profiler (Profiler) : Profiler that wrapped the run, if any.
+        extra (dict) : Additional sections, e.g. cache statistics.
+    Returns:
+        dict : Run report.
+    """
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "arguments": arguments or dict(),
+        "wallSeconds": wallSeconds,
+        "peakRssMb": peak_rss_mb(),
+        "stages": {name: {"seconds": STAGE_SECONDS[name], "calls": STAGE_CALLS[name]} for name in STAGE_SECONDS},
+        "counters": dict(COUNTERS),
+    }
+    if profiler is not None:
+        report.update(profiler.results)
+    if extra:
+        report.update(extra)
+    return report
+
+
+def write_run_report(report: dict, reportPath: str) -> None:
+    """
+    Description: Writes a run report as JSON and logs a one line summary per stage.
+    Parameters:
+        report (dict) : Report from build_run_report().
+        reportPath (str) : Path to the JSON file.
+    Returns:
+        None
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(reportPath)), exist_ok=True)
+    with open(reportPath, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=1, default=str)
+
+    for name, stage in sorted(report["stages"].items(), key=lambda item: item[1]["seconds"], reverse=True):
+        LOGGER.info("Stage %-14s %9.3fs in %d calls.", name, stage["seconds"], stage["calls"])
+    LOGGER.info("Run took %.3fs, report written to %s.", report["wallSeconds"], reportPath)
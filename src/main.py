@@ -2,186 +2,216 @@
 import pandas as pd
 import os
 from pathlib import Path
+from functools import cached_property
 
 import subprocess
 import numpy as np
 import sys
 import runpy
-
-ROOT_DIR = Path(__file__).parent.parent.absolute()
-DATA_DIR = f'{ROOT_DIR}\\data'
-LESSON_NAMES = os.listdir(f'{DATA_DIR}\\lessons')
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+# Make the 'src' package importable when this file is run directly as a script.
+if str(Path(__file__).parent.parent.absolute()) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+from src.model import LessonModel
+from src.validation import validate_lesson
+from src.engine import compute_table_four, compute_table_five
+from src.inputs import LessonInputs, log_read_counts, READ_COUNTS
+from src.manifest import Manifest
+from src.enrollment import EnrollmentIndex
+from src.writer import WriterPool, write_excel, write_excel_if_changed, is_unchanged
+from src.instrument import peak_rss_mb, StageTimer, count, metrics_snapshot, merge_metrics, reset_metrics
+from src.aggregate import aggregate
+from src.cache import CACHE_STATS, read_excel_cached
+from src.paths import ROOT_DIR, DATA_DIR, LESSONS_DIR, STUDENTS_DIR, CACHE_DIR, lesson_names
+
+LESSON_NAMES = lesson_names()
 ALL_LESSON_OBJECTS = list()
+ENROLLMENT_INDEX = EnrollmentIndex()
 # ==========================
 
 # ========================== Main Classes
 class Lesson:
     """
     Description: Lesson class.
+    Constructing a lesson does no work, every table is computed the first time it is accessed and then kept.
+    prepare() validates and computes the lesson and writes its tables, invalidate() forgets everything computed.
 
     Attributes:
         title (str) : Lesson title.
         inputFolderPath (str) : Lesson folder name.
-        tableOneDataFrame (pd.DataFrame) : Lesson's table one dataframe.
-        tableTwoDataFrame (pd.DataFrame) : Lesson's table two dataframe.
-        tableThreeDataFrame (pd.DataFrame) : Lesson's table three dataframe.
-        tableGradesDataFrame (pd.DataFrame) : Lesson's grade table dataframe.
-        lessonStudents (list) : Lesson's student list.
+        readOnly (bool) : If True, input workbooks are never rewritten and derived columns only live in memory.
+        excelBackend (str) : xlsx backend the lesson's tables are written with, see src.writer.BACKENDS.
+        dryRun (bool) : If True, prepare() only loads and computes the lesson, nothing is written (not even the parse cache)
+            and no folder is created.
+        model (LessonModel) : Lesson's validated input tables, labels as metadata and values as float64 arrays. Lazy.
+        tableOneDataFrame (pd.DataFrame) : Lesson's table one dataframe, built from the model when accessed. Lazy.
+        tableTwoDataFrame (pd.DataFrame) : Lesson's table two dataframe, built from the model when accessed. Lazy.
+        tableThreeDataFrame (pd.DataFrame) : Lesson's table three dataframe, built from the model when accessed. Lazy.
+        tableGradesDataFrame (pd.DataFrame) : Lesson's grade table dataframe, built from the model when accessed. Lazy.
+        lessonStudents (list) : Lesson's student list, only grades.xlsx is read if the model isn't built. Lazy.
+        tableFourResult (TableFourResult) : Table4 of every student registered to the lesson. Lazy.
+        tableFiveResult (TableFiveResult) : Table5 of every student registered to the lesson. Lazy.
 
     Member Functions:
         Utils:
             TODO: setter and getter functions
-            _create_dataframe_from_table (self: Lesson, tableNum:int) -> pd.Dataframe: Creates dataframe from tables (selects the table using 'tableNum'), updates tables after changes.
+            prepare (self: Lesson) -> Lesson: Computes the lesson, writes its tables and creates its students' folders.
+            invalidate (self: Lesson) -> None: Forgets every computed table, they are computed again when accessed.
+            pending_lesson_tables (self: Lesson) -> list: Paths of the lesson tables a run would write, used by dry runs.
+            _lesson_tables (self: Lesson) -> list: Tables _write_lesson_tables writes in the lesson's mode.
+            _write_lesson_tables (self: Lesson) -> None: Writes the lesson's tables with their derived columns, updates tables after changes.
             _check_tables (self: Lesson) -> None: Prints dataframes on console.
+            _is_table_three_stale (self: Lesson) -> bool: Checks if table3.xlsx is older than table2.xlsx.
             _create_folder_for_students (self: Lesson) -> None: Creates folder for students.
+            write_student_tables (self: Lesson, studentID: int | str, row: int, writer: WriterPool, overwrite: bool) -> None: Writes a student's table4 and table5.
     """
 
+    # Attributes computed on first access, invalidate() removes them.
+    LAZY_ATTRIBUTES = ("model", "tableOneDataFrame", "tableTwoDataFrame", "tableThreeDataFrame", "tableGradesDataFrame",
+                       "lessonStudents", "tableFourResult", "tableFiveResult")
+
 
-    def __init__(self, title: str):
+    def __init__(self, title: str, readOnly: bool = False, excelBackend: str = None, dryRun: bool = False):
         self.title = title
-        self.inputFolderPath = f'{DATA_DIR}\\lessons\\{self.title}'
-        self.tableOneDataFrame = self._create_df_from_lesson_table(1)
-        self.tableTwoDataFrame = self._create_df_from_lesson_table(2)
-        self.tableThreeDataFrame = self._create_df_from_lesson_table(3)
-        self.tableGradesDataFrame = self._create_df_from_lesson_table(0)
-        self.lessonStudents = [str(student) for student in self.tableGradesDataFrame.iloc[0:, 0].to_list()]
-        self._create_folder_for_students()
+        self.readOnly = readOnly
+        self.excelBackend = excelBackend
+        self.dryRun = dryRun
+        self.inputFolderPath = os.path.join(LESSONS_DIR, self.title)
+
+
+    @cached_property
+    def model(self) -> LessonModel:
+        # Parsed workbooks are only needed to build the model, they are released right after.
+        # A dry run writes nothing into the data folder, not even parse cache entries.
+        inputs = LessonInputs(self.inputFolderPath, dropDerived=self.readOnly, saveCache=not self.dryRun)
+
+        # Every problem of the inputs is reported at once, LessonValidationError lists them all.
+        with StageTimer("validate"):
+            validate_lesson(inputs.tableOne, inputs.tableTwo, inputs.tableGrades).raise_if_invalid()
+        with StageTimer("model"):
+            model = LessonModel(inputs.tableOne, inputs.tableTwo, inputs.tableGrades)
+        count("lessons")
+        return model
+
+    # The Excel layout of the tables is only built when it is asked for.
+    @cached_property
+    def tableOneDataFrame(self) -> pd.DataFrame:
+        return self.model.table_one_frame()
+
+    @cached_property
+    def tableTwoDataFrame(self) -> pd.DataFrame:
+        return self.model.table_two_frame()
+
+    @cached_property
+    def tableThreeDataFrame(self) -> pd.DataFrame:
+        return self.model.table_three_frame()
+
+    @cached_property
+    def tableGradesDataFrame(self) -> pd.DataFrame:
+        return self.model.grades_frame()
+
+    @cached_property
+    def lessonStudents(self) -> list:
+        # A lesson filter only needs the student ids, the other workbooks aren't parsed for them.
+        if "model" in self.__dict__:
+            studentIds = self.model.studentIds
+        else:
+            studentIds = read_excel_cached(os.path.join(self.inputFolderPath, "grades.xlsx"),
+                                           save=not self.dryRun).iloc[:, 0].to_list()
+        return [str(student) for student in studentIds]
 
+    @cached_property
+    def tableFourResult(self):
+        with StageTimer("table4"):
+            return compute_table_four(self.model)
 
-    def _create_df_from_lesson_table(self, tableNum: int) -> pd.DataFrame:
+    @cached_property
+    def tableFiveResult(self):
+        with StageTimer("table5"):
+            return compute_table_five(self.model, self.tableFourResult)
+
+
+    def prepare(self) -> "Lesson":
         """
-        Description: Function to create dataframe from tables.
+        Description: Validates and computes the lesson, writes its tables and creates its students' folders.
+        In a dry run the lesson is only validated and computed.
         Parameters:
-            tableNum (int) : Lesson's table number.
+            self (Lesson) : Lesson object.
         Returns:
-            pd.DataFrame : Lesson's table dataframe.
+            Lesson : The lesson itself, so it can be prepared where it is created.
+        Raises:
+            LessonValidationError : If the lesson's input tables are invalid.
         """
+        # Accessing a lazy attribute computes it, the model is validated before anything is written.
+        self.model
+        if not self.dryRun:
+            with StageTimer("lessonTables"):
+                self._write_lesson_tables()
 
-        # Arrange the actions to be taken in each choice.
-
-        if tableNum == 1:
-            # Select a table using 'tableNum' and read its xlsx files.
-            df = pd.read_excel(f"{self.inputFolderPath}\\table1.xlsx", sheet_name=0)
-
-            for col in df.columns[1:-1]:
-                for element in df[col][1:-1]:
-                    assert 0 <= element <= 1, "Table1's values must be in between 0 and 1."
-
-            # Calculate column 'İlişki Değeri'.
-            df['İlişki Değeri'] = df.iloc[1:, 1:].sum(axis=1) / (df.shape[1] - 1)
-            toplamIndex = df.columns.tolist().index('İlişki Değeri')
-            df.iloc[0, toplamIndex] = "İlişki Değeri"
-
-        if tableNum == 2:
-            # Select a table using 'tableNum' and read its xlsx files.
-            df = pd.read_excel(f"{self.inputFolderPath}\\table2.xlsx", sheet_name=0)
-
-            # If there are fewer than 3 tasks in the season, assert ValueError.
-            assert not len(df.columns) - 2 < 3, "Table2 must have at least 3 columns."
-
-            # If the grading weights do not sum up to 100, assert ValueError.
-            assert not df.iloc[0, 1:].sum() != 100, "Grading weights must sum to 100."
+        self.tableFiveResult
+        if not self.dryRun:
+            self._create_folder_for_students()
+        return self
 
-            # Calculate column 'TOPLAM'
-            if 'TOPLAM' in df.columns:
-                # If column 'TOPLAM' already exists, it'll cause recursion and the column values won't be correct.
-                df['TOPLAM'] = df.iloc[2:, 1:-1].sum(axis=1)
 
-            else:
-                # If column doesn't exist, recursion won't happen.
-                df['TOPLAM'] = df.iloc[2:, 1:].sum(axis=1)
-
-            # We have to bring actual columns (in this case its 'TOPLAM') down in order to work with them.
-            toplamIndex = df.columns.tolist().index('TOPLAM')
-            df.iloc[1, toplamIndex] = "TOPLAM"
-
-        if tableNum == 3:
-            # Read table2.
-            df2 = pd.read_excel(f"{self.inputFolderPath}\\table2.xlsx", sheet_name=0)
-
-            # Cut the dataframe to use just its values.
-            recalculatedDf2 = (df2.iloc[2:, 1:-1] * df2.iloc[0, 1:-1]) / 100
-
-            # Column 'Ders çıktı' needs to be added manually, identify the column.
-            columnDersCikti = df2.iloc[1:, 0].to_list()
-
-            # The keys in the original table are incorrect, so they need to be added manually. Identify the key row.
-            firstRow = df2.iloc[1, 1:-1].to_list()
-
-            # Create the third dataframe (df3) using recalculatedDf2.
-            # Column names are placeholders and should not be interpreted as actual keys.
-            # The actual keys are stored in the first row. This step improves the table's readability in Excel.
-            df3 = pd.DataFrame(recalculatedDf2.values,
-                               columns=['TABLO 3'] + ['Ağırlıklı Değerlendirme'] * (len(df2.columns) - 3))
-
-            # Insert the actual keys into first row.
-            df3 = pd.concat([pd.DataFrame([firstRow], columns=df3.columns), df3], ignore_index=True)
-
-            if 'TOPLAM' in df3.columns:
-                # If column 'TOPLAM' already exists, it'll cause recursion and the column values won't be correct.
-                df3['TOPLAM'] = df3.iloc[0:, 0:-1].sum(axis=1)
-
-            else:
-                # If column doesn't exist, recursion won't happen.
-                df3['TOPLAM'] = df3.iloc[0:, 0:].sum(axis=1)
+    def invalidate(self) -> None:
+        """Forgets every computed table (e.g. after the lesson's inputs changed), they are computed again when accessed."""
+        for attributeName in self.LAZY_ATTRIBUTES:
+            self.__dict__.pop(attributeName, None)
 
-            # Bring down the column 'TOPLAM'.
-            toplamIndex = df3.columns.tolist().index("TOPLAM")
-            df3.iloc[0, toplamIndex] = None
-            df3.iloc[0, toplamIndex] = "TOPLAM"
 
-            # If column 'Ders Çıktı' already exists, pass.
-            if 'Ders Çıktı' in df3.columns:
-                pass
-
-            # If column 'Ders Çıktı' does not exist, create one and insert it into the first column.
-            else:
-                df3.insert(0, 'Ders Çıktı', columnDersCikti)
-            # Choose df3 as the output dataframe (df).
-            df = df3
-
-        if tableNum == 0:
-            # Read the grades table.
-            df = pd.read_excel(f"{self.inputFolderPath}\\grades.xlsx", sheet_name=0)
+    def _lesson_tables(self) -> list:
+        """
+        Description: Lists the tables _write_lesson_tables writes in the lesson's mode.
+        Parameters:
+            self (Lesson) : Lesson object.
+        Returns:
+            list : (frame builder, excelPath, onlyIfChanged) tuples, inputs are only written if their cells changed.
+        """
 
-            if 'ORT' not in df.columns:
-                # Read table2 and crop the values.
-                df2 = pd.read_excel(f"{self.inputFolderPath}\\table2.xlsx", sheet_name=0)
-                df2_cropped = df2.iloc[2:, 1:-1]
+        # Frames are built from the model instead of the cached attributes, written tables aren't kept in memory.
+        # In read-only mode the inputs are never rewritten, derived columns only live in memory.
+        # Table3 is not an input, write it only if table2 changed since it was last written.
+        tableThree = (self.model.table_three_frame, os.path.join(self.inputFolderPath, "table3.xlsx"), False)
+        if self.readOnly:
+            return [tableThree] if self._is_table_three_stale() else []
 
-                # Identify the weights from table2.
-                weights = df2.iloc[0, 1:-1].to_list()
+        # Rewrite the tables, the grades table is written into grades.xlsx.
+        # Inputs that already hold their derived columns are left untouched, so their parse cache entries stay valid.
+        return [(self.model.table_one_frame, os.path.join(self.inputFolderPath, "table1.xlsx"), True),
+                (self.model.table_two_frame, os.path.join(self.inputFolderPath, "table2.xlsx"), True),
+                tableThree,
+                (self.model.grades_frame, os.path.join(self.inputFolderPath, "grades.xlsx"), True)]
 
-                # Calculate the weighted scores using weights and grades.
-                weighted_scores = df.iloc[:, 1:].mul(weights, axis=1) / 100
 
-                # Create the column 'ORT' and insert the sum of the row's weighted scores.
-                df["ORT"] = weighted_scores.sum(axis=1)
+    def pending_lesson_tables(self) -> list:
+        """
+        Description: Returns the lesson tables a run would write, with the same checks as _write_lesson_tables. Nothing is written.
+        Parameters:
+            self (Lesson) : Lesson object.
+        Returns:
+            list : Paths of the tables that would be written.
+        """
+        return [excelPath for build_frame, excelPath, onlyIfChanged in self._lesson_tables()
+                if not (onlyIfChanged and is_unchanged(build_frame(), excelPath))]
 
-                # If table2 and grades table column counts doesn't match, assert an error.
-                assert len(df2_cropped.columns) == (
-                            len(df.columns) - 2), "Table2 and TableGrades column counts must be the same."
 
+    def _write_lesson_tables(self) -> None:
+        """
+        Description: Writes the lesson's tables with their derived columns ('İlişki Değeri', 'TOPLAM', 'ORT') and table3.
+        Parameters:
+            self (Lesson) : Lesson object.
+        Returns:
+            None
+        """
+        for build_frame, excelPath, onlyIfChanged in self._lesson_tables():
+            if onlyIfChanged:
+                write_excel_if_changed(build_frame(), excelPath, self.excelBackend)
             else:
-                pass
-
-        # If wrong option is chosen, assert an error.
-        else:
-            assert 0 <= tableNum <= 3, "Wrong input table number. Options are: 0, 1, 2 or 3."
-
-        # Remove 'unnamed' from tables.
-        df.columns = [col if "Unnamed" not in col else "" for col in df.columns]
-        resultDf = df
-
-        # Rewrite the table and return the dataframe.
-        if tableNum != 0:
-            resultDf.to_excel(f"{self.inputFolderPath}\\table{tableNum}.xlsx", index=False)
-
-        # If tableNum is 0, change its filename to grades.xlsx.
-        elif tableNum == 0:
-            resultDf.to_excel(f"{self.inputFolderPath}\\grades.xlsx", index=False)
-
-        return resultDf
+                write_excel(build_frame(), excelPath, self.excelBackend)
 
 
     def _check_tables(self) -> None:
@@ -195,21 +225,52 @@ class Lesson:
         print(self.tableGradesDataFrame.to_string())
 
 
+    def _is_table_three_stale(self) -> bool:
+        """Returns True if table3.xlsx does not exist or is older than table2.xlsx."""
+        tableThreePath = os.path.join(self.inputFolderPath, "table3.xlsx")
+        if not os.path.exists(tableThreePath):
+            return True
+        return os.path.getmtime(tableThreePath) < os.path.getmtime(os.path.join(self.inputFolderPath, "table2.xlsx"))
+
+
     def _create_folder_for_students(self) -> None:
         """Creates directory for every student registered to the lesson."""
 
-        # For every student in self.lessonStudents,
+        # For every student in self.lessonStudents, create a folder named their id if they don't have one.
+        # Lessons may be loaded in parallel, so another process may create the same folder at the same time.
         for studentID in self.lessonStudents:
+            os.makedirs(os.path.join(STUDENTS_DIR, studentID), exist_ok=True)
 
-            # If the student have their own folder, pass.
-            if str(studentID) in os.listdir(f'{DATA_DIR}\\students\\'):
-                pass
 
-            # If not,
-            elif str(studentID) not in os.listdir(f'{DATA_DIR}\\students\\'):
+    def write_student_tables(self, studentID, row: int, writer: WriterPool, overwrite: bool = False) -> None:
+        """
+        Description: Slices a student's table4 and table5 and queues them into the writer.
+        Parameters:
+            studentID (int | str) : Student id.
+            row (int) : Student's row in the lesson's grades table.
+            writer (WriterPool) : Output stage.
+            overwrite (bool) : If False, tables that already exist are not written again.
+        Returns:
+            None
+        """
+        studentLessonPath = os.path.join(STUDENTS_DIR, str(studentID), self.title)
 
-                # Create a folder named their id.
-                os.mkdir(f"{DATA_DIR}\\students\\{studentID}")
+        # Create a folder for the lesson.
+        os.makedirs(studentLessonPath, exist_ok=True)
+        existingTables = set() if overwrite else set(os.listdir(studentLessonPath))
+
+        count("studentLessons")
+
+        # Write dataframes into their excel tables, tables that are kept are counted so timings can be read with them.
+        if 'table4.xlsx' not in existingTables:
+            writer.submit(self.tableFourResult.student_frame(row), os.path.join(studentLessonPath, "table4.xlsx"))
+        else:
+            count("filesSkipped")
+
+        if 'table5.xlsx' not in existingTables:
+            writer.submit(self.tableFiveResult.student_frame(row), os.path.join(studentLessonPath, "table5.xlsx"))
+        else:
+            count("filesSkipped")
 
 
 
@@ -219,34 +280,30 @@ class Student:
     Attributes:
         id (int): Student id.
         folderPath : Student folder path.
-        allLessonObjects (list): Lesson objects list.
+        enrollmentIndex (EnrollmentIndex): Student -> lessons and lesson -> student row index.
         lessons: Student lessons.
+        stalePairs (set | None): (student id, lesson title) pairs to rewrite. If None, only missing tables are written.
+        writer (WriterPool): Output stage that writes the student's tables.
     Member Functions:
         TODO: setter and getter functions
         _find_lessons (self: Student) -> list: Finds registered lessons for every student.
         _create_df_from_student_table(self: Student) -> None: Creates dataframe from tables and writes them in an excel file.
     """
 
-    def __init__(self, id: int):
+    def __init__(self, id: int, stalePairs: set = None, writer: WriterPool = None):
         self.id = id
-        self.folderPath = f'{DATA_DIR}\\students\\{self.id}'
-        self.allLessonObjects = ALL_LESSON_OBJECTS
+        self.stalePairs = stalePairs
+        self.writer = writer if writer is not None else WriterPool()
+        self.folderPath = os.path.join(STUDENTS_DIR, str(self.id))
+        self.enrollmentIndex = ENROLLMENT_INDEX
         self.lessons = self._find_lessons()
         self._create_df_from_student_table()
+        count("students")
 
 
     def _find_lessons(self) -> list:
-        """Finds registered lessons for the student."""
-
-        lessons = list()
-        # For every lesson in all lessons,
-        for lesson in self.allLessonObjects:
-
-            # If student id is in the lesson's lessonStudents list,
-            if str(self.id) in lesson.lessonStudents:
-                # Append lesson to student's lessons list.
-                lessons.append(lesson)
-        return lessons
+        """Finds registered lessons for the student using the enrollment index."""
+        return list(self.enrollmentIndex.lessons_of(self.id))
 
 
     def _create_df_from_student_table(self) -> None:
@@ -261,113 +318,293 @@ class Student:
         # For every lesson in student's lessons list,
         for lesson in self.lessons:
 
-            # Create a folder for the lesson.
-            if lesson.title not in os.listdir(f"{DATA_DIR}\\students\\{self.id}\\"):
-                os.mkdir(f"{DATA_DIR}\\students\\{self.id}\\{lesson.title}")
-
-            # Get dataframes '3' and 'grades',
-            df3 = lesson.tableThreeDataFrame
-            dfGrades = lesson.tableGradesDataFrame
+            # In incremental runs, only stale pairs are written, and they are rewritten even if they already exist.
+            if self.stalePairs is not None and (str(self.id), lesson.title) not in self.stalePairs:
+                continue
 
-            # Cut the dataframes to use just its values.
-            recalculatedDf3 = df3.iloc[1:, 1:-1]
-            recalculatedDfGrades = dfGrades.iloc[:, 1:-1]
+            # Table4 and table5 of every student are computed once per lesson, the lesson slices the student's rows.
+            row = self.enrollmentIndex.row_of(lesson.title, self.id)
+            lesson.write_student_tables(self.id, row, self.writer, overwrite=self.stalePairs is not None)
 
-            # Get column 'TOPLAM' from dataframe 3 to calculate the 'MAX' column.
-            # Column 'Ders çıktı' needs to be added manually, get the column from dataframe 3.
-            columnDersCikti = df3.iloc[1:, 0].to_list()
-            columnToplamDf3 = df3.iloc[1:, -1]
-            columnToplamDf3Rounded = [round(num, 3) for num in columnToplamDf3]
 
-            # Create another list that is filled with hundreds using the length of columnMax
-            hundredsList = [100] * len(columnToplamDf3Rounded)
-            columnMaxDf4 = [int(x * y) for x, y in zip(columnToplamDf3Rounded, hundredsList)]
-
-            # Create the dataframe '4'.
-            df4 = pd.DataFrame(recalculatedDf3.values, columns=recalculatedDfGrades.columns.to_list())
-
-            # For every studentID in 'grades' dataframe,
-            for studentID in dfGrades.iloc[:, 0].to_list():
-
-                # If studentID matches with current student,
-                if studentID == self.id:
+# ========================== Main Functions
+def _load_lesson_in_worker(lessonTitle: str, readOnly: bool, excelBackend: str = None, dryRun: bool = False) -> tuple:
+    """
+    Description: Loads a lesson in a worker process.
+    Parameters:
+        lessonTitle (str): Lesson title.
+        readOnly (bool): Read-only input mode.
+        excelBackend (str): xlsx backend.
+        dryRun (bool): Don't write anything.
+    Returns:
+        tuple : (Lesson, READ_COUNTS of the worker, CACHE_STATS of the worker, stage times and counters of the worker)
+    """
+    # Workers are reused for several lessons, only report this lesson's counters.
+    READ_COUNTS.clear()
+    CACHE_STATS.clear()
+    reset_metrics()
+    lessonObj = Lesson(lessonTitle, readOnly=readOnly, excelBackend=excelBackend, dryRun=dryRun).prepare()
+    return lessonObj, dict(READ_COUNTS), dict(CACHE_STATS), metrics_snapshot()
 
-                    # Find the student's row index,
-                    # Put the index into a buffer list, then get the index using [0] from the buffer list.
-                    rowIndex = dfGrades.index[dfGrades["Öğrenci"] == self.id].to_list()[0]
 
-                    # Using the rowIndex, find the current student's grades and insert them into a list.
-                    # Multiply every single grade with their weight, change the datatype to integer.
-                    studentGrades = recalculatedDfGrades.iloc[rowIndex, :].to_list()
-                    tableFourDataFrame = df4.mul(studentGrades, axis=1)
-                    tableFourDataFrame = tableFourDataFrame.astype(int)
+def load_lessons(lessonTitles: list, readOnly: bool, jobs: int, excelBackend: str = None, dryRun: bool = False) -> list:
+    """
+    Description: Loads lessons, in a process pool if jobs > 1. Lessons are independent of each other.
+    The result is in the same order as lessonTitles, so the output is identical to loading them one by one.
+    Parameters:
+        lessonTitles (list): Titles of the lessons to load.
+        readOnly (bool): Read-only input mode.
+        jobs (int): Number of worker processes.
+        excelBackend (str): xlsx backend.
+        dryRun (bool): Don't write anything.
+    Returns:
+        list : Loaded Lesson objects.
+    """
+    if jobs <= 1 or len(lessonTitles) <= 1:
+        return [Lesson(lessonTitle, readOnly=readOnly, excelBackend=excelBackend, dryRun=dryRun).prepare()
+                for lessonTitle in lessonTitles]
+
+    lessons = list()
+    with ProcessPoolExecutor(max_workers=min(jobs, len(lessonTitles))) as executor:
+        for lessonObj, readCounts, cacheStats, metrics in executor.map(_load_lesson_in_worker, lessonTitles,
+                                                               [readOnly] * len(lessonTitles),
+                                                               [excelBackend] * len(lessonTitles),
+                                                               [dryRun] * len(lessonTitles)):
+            # Merge the workers' counters, so the read counts are still reported for the whole run.
+            READ_COUNTS.update(readCounts)
+            CACHE_STATS.update(cacheStats)
+            merge_metrics(metrics)
+            lessons.append(lessonObj)
+    return lessons
+
+
+def reset_run_state() -> None:
+    """
+    Description: Clears what a run leaves behind, so the pipeline can run again in the same process (e.g. from the UI).
+    Lessons are listed again, a lesson may have been created since the last run.
+    [AFFECTS GLOBAL SCOPE VARIABLES] -> LESSON_NAMES, ALL_LESSON_OBJECTS, ENROLLMENT_INDEX
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+    global ENROLLMENT_INDEX
+    LESSON_NAMES[:] = lesson_names()
+    ALL_LESSON_OBJECTS.clear()
+    ENROLLMENT_INDEX = EnrollmentIndex()
+    READ_COUNTS.clear()
+    CACHE_STATS.clear()
+    reset_metrics()
 
-                    # Create the column 'TOPLAM'.
-                    tableFourDataFrame["TOPLAM"] = tableFourDataFrame.sum(axis=1)
-                    tableFourDataFrame["MAX"] = columnMaxDf4
-                    tableFourDataFrame["Başarı"] = round((tableFourDataFrame["TOPLAM"] / tableFourDataFrame["MAX"]) * 100, 1)
-                    tableFourDataFrame.insert(0, 'Ders Çıktı', columnDersCikti)
 
+def register_lesson(lessonObj: Lesson) -> None:
+    """
+    Description: Adds a loaded lesson to ALL_LESSON_OBJECTS and indexes its students.
+    [AFFECTS GLOBAL SCOPE VARIABLES] -> ALL_LESSON_OBJECTS, ENROLLMENT_INDEX
 
+    Parameters:
+        lessonObj (Lesson): Loaded lesson object.
+    Returns:
+        None
+    """
+    ALL_LESSON_OBJECTS.append(lessonObj)
+    ENROLLMENT_INDEX.add_lesson(lessonObj)
 
-            # Get dataframe 1 and sanitize it.
-            df1 = lesson.tableOneDataFrame
-            recalculatedDf1 = df1.iloc[1:, 1:-1]
 
-            # Get column 'Başarı' from dataframe 4.
-            columnBasari = tableFourDataFrame["Başarı"].to_list()
+def run_incremental(jobs: int, writeJobs: int, excelBackend: str = None, lessonTitles: list = None,
+                    aggregateLessons: bool = True) -> None:
+    """
+    Description: Recomputes and rewrites only the stale lessons and student-lesson pairs, using the dependency manifest.
+    A lesson is stale if its inputs changed or its aggregated tables are missing/modified.
+    A student-lesson pair is stale if the lesson's inputs changed or the pair's table4/table5 are missing/modified.
+    Inputs are never rewritten (read-only mode), otherwise every run would change their fingerprints.
+    [AFFECTS GLOBAL SCOPE VARIABLES] -> ALL_LESSON_OBJECTS, ENROLLMENT_INDEX
+
+    Parameters:
+        jobs (int): Number of worker processes to load and aggregate the stale lessons with.
+        writeJobs (int): Number of worker processes to write the students' tables with.
+        excelBackend (str): xlsx backend.
+        lessonTitles (list): Lessons to check, every lesson if None.
+        aggregateLessons (bool): If False, lessons are not aggregated and are not recorded, they stay stale for the next run.
+    Returns:
+        None
+    """
+    manifest = Manifest(DATA_DIR, os.path.join(CACHE_DIR, "manifest.json"))
+    stalePairs = set()
+    changedInputs = dict()
+    staleStudents = dict()
+
+    for lessonTitle in lessonTitles or LESSON_NAMES:
+        changedInputs[lessonTitle] = manifest.lesson_inputs_changed(lessonTitle)
+        staleStudents[lessonTitle] = manifest.stale_students(lessonTitle)
+
+        # Nothing to do for this lesson, don't even load it.
+        if not changedInputs[lessonTitle] and not staleStudents[lessonTitle] \
+                and not manifest.lesson_outputs_changed(lessonTitle):
+            del changedInputs[lessonTitle]
+
+    with StageTimer("load"):
+        staleLessons = load_lessons(list(changedInputs), readOnly=True, jobs=jobs, excelBackend=excelBackend)
+
+    for lessonObj in staleLessons:
+        register_lesson(lessonObj)
+
+        # If the inputs changed, every student's tables changed too.
+        lessonStaleStudents = staleStudents[lessonObj.title]
+        if changedInputs[lessonObj.title]:
+            lessonStaleStudents = set(lessonObj.lessonStudents)
+        stalePairs |= {(studentID, lessonObj.title) for studentID in lessonStaleStudents & set(lessonObj.lessonStudents)}
+
+    log_read_counts()
+    logging.info("Incremental run: %d stale lessons, %d stale student-lesson pairs.", len(staleLessons), len(stalePairs))
+
+    # Only the students of stale pairs are visited. Every table is written before the aggregation starts.
+    with StageTimer("studentTables"), WriterPool(maxWorkers=writeJobs, backend=excelBackend) as writer:
+        for studentID in sorted({studentID for studentID, _ in stalePairs}):
+            Student(int(studentID), stalePairs=stalePairs, writer=writer)
+
+    # Record the new fingerprints of the students' tables.
+    for studentID, lessonTitle in stalePairs:
+        manifest.record_student(studentID, lessonTitle)
+
+    # Aggregate only the stale lessons, straight from their computed tables.
+    if aggregateLessons:
+        aggregate(lesson_objects=staleLessons, jobs=jobs, backend=excelBackend)
+        for lessonObj in staleLessons:
+            manifest.record_lesson(lessonObj.title, lessonObj.lessonStudents)
+    manifest.save()
+
+
+def run_streaming(readOnly: bool, writeJobs: int, excelBackend: str = None, lessonTitles: list = None,
+                  studentIDs: set = None, aggregateLessons: bool = True) -> None:
+    """
+    Description: Lesson-major streaming run. Lessons are processed one at a time: load, write every student's
+    table4/table5, aggregate, release. Lessons are not kept in ALL_LESSON_OBJECTS, so the peak memory is
+    bounded by the largest lesson instead of the sum of all lessons.
+
+    Parameters:
+        readOnly (bool): Read-only input mode.
+        writeJobs (int): Number of worker processes to write the students' tables with.
+        excelBackend (str): xlsx backend.
+        lessonTitles (list): Lessons to process, every lesson if None.
+        studentIDs (set): Students (str ids) whose tables are written, every student if None.
+        aggregateLessons (bool): If False, the lessons' table4/table5 are not aggregated.
+    Returns:
+        None
+    """
+    with WriterPool(maxWorkers=writeJobs, backend=excelBackend) as writer:
+        for lessonTitle in lessonTitles or LESSON_NAMES:
+            with StageTimer("load"):
+                lessonObj = Lesson(lessonTitle, readOnly=readOnly, excelBackend=excelBackend).prepare()
 
-            # Get column 'Prg Çıktı' from dataframe 1.
-            columnPrgCikti = df1.iloc[1:, 0].to_list()
+            # Write the tables of every (selected) student registered to the lesson.
+            lessonStudentRows = lessonObj.tableFourResult.studentRows
+            if studentIDs is not None:
+                lessonStudentRows = {studentID: row for studentID, row in lessonStudentRows.items() if studentID in studentIDs}
 
-            # Initialize dataframe 5 using dataframe 1's values.
-            df5 = pd.DataFrame(recalculatedDf1.values, columns=columnBasari)
+            # A scoped run is a rebuild of the selected lessons/students, their tables are rewritten even if they exist.
+            with StageTimer("studentTables"):
+                for studentID, row in lessonStudentRows.items():
+                    lessonObj.write_student_tables(studentID, row, writer, overwrite=bool(lessonTitles) or studentIDs is not None)
 
-            # Multiply every element with column 'Başarı' from dataframe 4.
-            tableFiveDataFrame = df5.mul(columnBasari, axis=1)
+            # The lesson is aggregated from its computed tables, the writers don't have to catch up first.
+            # With selected students, only their lessons changed.
+            if aggregateLessons and lessonStudentRows:
+                aggregate(lesson_objects=[lessonObj], backend=excelBackend)
 
-            # Create a phantom dataframe where every single grade is maximum.
-            hundredsList = [100] * len(columnBasari)
-            maxGradedDf5 = df5.mul(hundredsList, axis=1)
-            maxGradedDf5["MAXBASARI"] = maxGradedDf5.sum(axis=1)
+            # Release the lesson before the next one is loaded.
+            del lessonObj
+            peakRss = peak_rss_mb()
+            logging.info("%s done, peak RSS so far: %s MB.", lessonTitle, "n/a" if peakRss is None else f"{peakRss:.1f}")
 
-            # Calculate total weighted grades for student.
-            columnTotalBasariDf5 = tableFiveDataFrame.sum(axis=1).to_list()
+    log_read_counts()
 
-            # Round total weighted grades and insert them into another phantom dataframe.
-            columnTotalBasariDf5Rounded = [round(i, 3) for i in columnTotalBasariDf5]
-            df5["TOTALBASARI"] = columnTotalBasariDf5Rounded
 
-            # Insert column 'Prg Çıktı' to dataframe 5.
-            tableFiveDataFrame.insert(0, 'Prg Çıktı', columnPrgCikti)
+def run_full(readOnly: bool, jobs: int, writeJobs: int, excelBackend: str = None, lessonTitles: list = None,
+             studentIDs: set = None, aggregateLessons: bool = True, dryRun: bool = False, progress=None) -> None:
+    """
+    Description: Loads the lessons, writes their students' table4/table5 and aggregates them.
+    Runs can be scoped to some lessons and/or students, e.g. after fixing a single lesson's grades.
+    [AFFECTS GLOBAL SCOPE VARIABLES] -> ALL_LESSON_OBJECTS, ENROLLMENT_INDEX
+
+    Parameters:
+        readOnly (bool): Read-only input mode.
+        jobs (int): Number of worker processes to load and aggregate the lessons with.
+        writeJobs (int): Number of worker processes to write the students' tables with.
+        excelBackend (str): xlsx backend.
+        lessonTitles (list): Lessons to process, every lesson if None.
+        studentIDs (set): Students (str ids) whose tables are written, every student if None.
+            Only the lessons of these students are aggregated.
+        aggregateLessons (bool): If False, the lessons' table4/table5 are not aggregated.
+        dryRun (bool): If True, lessons are loaded and validated but nothing is written, the planned work is logged.
+        progress (callable): Called as progress(stage, done, total) after every lesson load, student and aggregation.
+    Returns:
+        None
+    """
+    # Create a 'Lesson' object for every selected lesson title (in parallel if jobs > 1),
+    # insert them into ALL_LESSON_OBJECTS and index their students.
+    with StageTimer("load"):
+        for lessonObj in load_lessons(lessonTitles or LESSON_NAMES, readOnly=readOnly, jobs=jobs,
+                                      excelBackend=excelBackend, dryRun=dryRun):
+            register_lesson(lessonObj)
+
+    # Every input workbook must have been parsed exactly once.
+    log_read_counts()
+    if progress is not None:
+        progress("load", len(ALL_LESSON_OBJECTS), len(ALL_LESSON_OBJECTS))
+
+    # Students registered to at least one of the loaded lessons, and the lessons they affect.
+    selectedStudents = ENROLLMENT_INDEX.student_ids()
+    lessonsToAggregate = ALL_LESSON_OBJECTS
+    if studentIDs is not None:
+        for studentID in sorted(studentIDs - set(selectedStudents)):
+            logging.warning("Student %s is not registered to any of the selected lessons.", studentID)
+        selectedStudents = [studentID for studentID in selectedStudents if studentID in studentIDs]
+        lessonsToAggregate = [lessonObj for lessonObj in ALL_LESSON_OBJECTS if studentIDs & set(lessonObj.lessonStudents)]
+
+    if dryRun:
+        studentLessons = sum(len(ENROLLMENT_INDEX.lessons_of(studentID)) for studentID in selectedStudents)
+        # Same checks as the real run: unchanged inputs are kept, and existing student tables are only rewritten in scoped runs.
+        lessonTables = sum(len(lessonObj.pending_lesson_tables()) for lessonObj in ALL_LESSON_OBJECTS)
+        studentTables = 2 * studentLessons
+        if not (lessonTitles or studentIDs is not None):
+            studentTables = sum(not os.path.exists(os.path.join(STUDENTS_DIR, studentID, lessonObj.title, tableName))
+                                for studentID in selectedStudents for lessonObj in ENROLLMENT_INDEX.lessons_of(studentID)
+                                for tableName in ("table4.xlsx", "table5.xlsx"))
+        aggregatedTables = 2 * len(lessonsToAggregate) if aggregateLessons else 0
+        logging.info("Dry run: %d lessons valid, %d students, %d student-lesson pairs.",
+                     len(ALL_LESSON_OBJECTS), len(selectedStudents), studentLessons)
+        logging.info("Would write %d lesson tables, %d student tables and %d aggregated tables (%s).",
+                     lessonTables, studentTables, aggregatedTables,
+                     ", ".join(lessonObj.title for lessonObj in lessonsToAggregate) if aggregateLessons else "no aggregation")
+        return
+
+    # A scoped run is a rebuild of the selected lessons/students, their tables are rewritten even if they exist.
+    stalePairs = None
+    if lessonTitles or studentIDs is not None:
+        stalePairs = {(studentID, lessonObj.title) for studentID in selectedStudents
+                      for lessonObj in ENROLLMENT_INDEX.lessons_of(studentID)}
 
-            # Calculate column 'Başarı Oranı' using phantom dataframe df5's 'TOTALBASARI' and
-            # phantom dataframe maxGradedDf5's 'MAXBASARI' columns, and insert it into the actual tableFiveDataFrame.
-            tableFiveDataFrame["Başarı Oranı"] = round((df5["TOTALBASARI"] / maxGradedDf5["MAXBASARI"]) * 100, 1)
+    # After the 'Lesson' class is called, the 'students' folder will be filled with all students.
+    # For every selected student registered to at least one lesson,
+    # queue their tables into the writer pool, every table is written before the aggregation starts.
+    with StageTimer("studentTables"), WriterPool(maxWorkers=writeJobs, backend=excelBackend) as writer:
+        for studentNumber, studentID in enumerate(selectedStudents, start=1):
 
-            # Write dataframes into their excel tables.
-            if 'table4.xlsx' not in os.listdir(f'{DATA_DIR}\\students\\{self.id}\\{lesson.title}\\'):
-                tableFourDataFrame.to_excel(f'{DATA_DIR}\\students\\{self.id}\\{lesson.title}\\table4.xlsx', index=False)
+            # Create a 'Student' object to represent them.
+            studentObj = Student(int(studentID), stalePairs=stalePairs, writer=writer)
+            if progress is not None:
+                progress("studentTables", studentNumber, len(selectedStudents))
 
-            if 'table5.xlsx' not in os.listdir(f'{DATA_DIR}\\students\\{self.id}\\{lesson.title}\\'):
-                tableFiveDataFrame.to_excel(f'{DATA_DIR}\\students\\{self.id}\\{lesson.title}\\table5.xlsx', index=False)
+    # Aggregate the lessons in the same process, from the tables computed above instead of re-reading the students' files.
+    if aggregateLessons:
+        aggregate(lesson_objects=lessonsToAggregate, jobs=jobs, backend=excelBackend)
+        if progress is not None:
+            progress("aggregate", len(lessonsToAggregate), len(lessonsToAggregate))
 
 
-# ========================== Main Functions
 if __name__ == '__main__':
-    # For every lesson title in LESSON_NAMES,
-    for lessonTitle in LESSON_NAMES:
-
-        # Create a 'Lesson' object to represent them and insert it into ALL_LESSON_OBJECTS.
-        lessonObj = Lesson(lessonTitle)
-        ALL_LESSON_OBJECTS.append(lessonObj)
-
-    # After the 'Lesson' class is called, the 'students' folder will be filled with all students.
-    # For every student folder in students folder,
-    for studentID in os.listdir(f'{DATA_DIR}\\students'):
-
-        # Create a 'Student' object to represent them.
-        studentObj = Student(int(studentID))
-
-    subprocess.call(f"python {ROOT_DIR}/src/aggregate.py", shell=False)
-
+    # The command line lives in src/__main__.py, 'python src/main.py ...' is the same as 'python -m src ...'.
+    # It runs in a fresh interpreter, so '--data-dir' is applied before the pipeline modules are imported.
+    sys.exit(subprocess.call([sys.executable, "-m", "src", *sys.argv[1:]], cwd=ROOT_DIR))
@@ -0,0 +1,171 @@
+# ===============================================
+import os
+import json
+
+from src.cache import file_hash
+from src.paths import temporary_path
+
+# Input workbooks of a lesson, a lesson has to be recomputed if any of them changes.
+LESSON_INPUTS = ("table1.xlsx", "table2.xlsx", "grades.xlsx")
+
+# Aggregated outputs of a lesson and outputs of a student-lesson pair.
+LESSON_OUTPUTS = ("table4.xlsx", "table5.xlsx")
+STUDENT_OUTPUTS = ("table4.xlsx", "table5.xlsx")
+# ===============================================
+
+
+def fingerprint(filePath: str, previous: dict = None) -> dict | None:
+    """
+    Description: Fingerprints a file with its mtime, size and content hash.
+    The content is only hashed if mtime or size differ from the previous fingerprint.
+    Parameters:
+        filePath (str) : Path to the file.
+        previous (dict) : Previous fingerprint of the file, if there is one.
+    Returns:
+        dict : {"mtime": int, "size": int, "sha1": str}
+        None : If the file does not exist.
+    """
+    if not os.path.exists(filePath):
+        return None
+
+    stat = os.stat(filePath)
+    if previous is not None and previous["mtime"] == stat.st_mtime_ns and previous["size"] == stat.st_size:
+        return previous
+
+    return {"mtime": stat.st_mtime_ns, "size": stat.st_size, "sha1": file_hash(filePath)}
+
+
+class Manifest:
+    """
+    Description: Dependency manifest of the last run. Records input and output fingerprints of every lesson
+    and output fingerprints of every student-lesson pair, so a run can recompute only what is stale.
+
+    Attributes:
+        dataDir (str) : Path to the data folder.
+        manifestPath (str) : Path to the manifest file.
+        lessons (dict) : lesson title -> {"inputs": {file: fingerprint}, "outputs": {file: fingerprint}, "students": [id]}
+        students (dict) : "id/lesson title" -> {file: fingerprint}
+
+    Member Functions:
+        lesson_inputs_changed (self: Manifest, lessonTitle: str) -> bool: Checks the lesson's input workbooks.
+        lesson_outputs_changed (self: Manifest, lessonTitle: str) -> bool: Checks the lesson's aggregated tables.
+        stale_students (self: Manifest, lessonTitle: str) -> set: Finds students whose outputs are missing or modified.
+        record_lesson (self: Manifest, lessonTitle: str, lessonStudents: list) -> None: Records a recomputed lesson.
+        record_student (self: Manifest, studentID: str, lessonTitle: str) -> None: Records a rewritten student-lesson pair.
+        save (self: Manifest) -> None: Writes the manifest to disk.
+    """
+
+    def __init__(self, dataDir: str, manifestPath: str):
+        self.dataDir = dataDir
+        self.manifestPath = manifestPath
+        self.lessons = dict()
+        self.students = dict()
+
+        # A missing or broken manifest means everything is stale.
+        if os.path.exists(manifestPath):
+            try:
+                with open(manifestPath, encoding="utf-8") as file:
+                    content = json.load(file)
+                self.lessons = content.get("lessons", dict())
+                self.students = content.get("students", dict())
+            except (OSError, ValueError):
+                pass
+
+
+    def _lesson_file(self, lessonTitle: str, fileName: str) -> str:
+        return os.path.join(self.dataDir, "lessons", lessonTitle, fileName)
+
+
+    def _student_file(self, studentID: str, lessonTitle: str, fileName: str) -> str:
+        return os.path.join(self.dataDir, "students", str(studentID), lessonTitle, fileName)
+
+
+    def _changed(self, recorded: dict, filePaths: dict) -> bool:
+        """
+        Description: Compares files with their recorded fingerprints.
+        Parameters:
+            recorded (dict) : file name -> recorded fingerprint.
+            filePaths (dict) : file name -> path to the file.
+        Returns:
+            bool : True if any file is missing, new or has a different content.
+        """
+        for fileName, filePath in filePaths.items():
+            previous = recorded.get(fileName)
+            current = fingerprint(filePath, previous)
+            if previous is None or current is None or current["sha1"] != previous["sha1"]:
+                return True
+        return False
+
+
+    def lesson_inputs_changed(self, lessonTitle: str) -> bool:
+        """Returns True if the lesson is new or any of its input workbooks changed since the last run."""
+        if lessonTitle not in self.lessons:
+            return True
+        return self._changed(self.lessons[lessonTitle]["inputs"],
+                             {fileName: self._lesson_file(lessonTitle, fileName) for fileName in LESSON_INPUTS})
+
+
+    def lesson_outputs_changed(self, lessonTitle: str) -> bool:
+        """Returns True if the lesson's aggregated tables are missing or were modified since the last run."""
+        if lessonTitle not in self.lessons:
+            return True
+        return self._changed(self.lessons[lessonTitle]["outputs"],
+                             {fileName: self._lesson_file(lessonTitle, fileName) for fileName in LESSON_OUTPUTS})
+
+
+    def stale_students(self, lessonTitle: str) -> set:
+        """
+        Description: Finds the students of a lesson whose table4/table5 are missing or were modified since the last run.
+        Parameters:
+            lessonTitle (str) : Lesson title.
+        Returns:
+            set : Ids (str) of the stale students.
+        """
+        staleStudents = set()
+        for studentID in self.lessons.get(lessonTitle, dict()).get("students", list()):
+            recorded = self.students.get(f"{studentID}/{lessonTitle}", dict())
+            filePaths = {fileName: self._student_file(studentID, lessonTitle, fileName) for fileName in STUDENT_OUTPUTS}
+            if self._changed(recorded, filePaths):
+                staleStudents.add(studentID)
+        return staleStudents
+
+
+    def record_lesson(self, lessonTitle: str, lessonStudents: list) -> None:
+        """
+        Description: Records the current input and output fingerprints of a lesson.
+        Parameters:
+            lessonTitle (str) : Lesson title.
+            lessonStudents (list) : Ids of the students registered to the lesson.
+        Returns:
+            None
+        """
+        previous = self.lessons.get(lessonTitle, {"inputs": dict(), "outputs": dict()})
+
+        # Forget the students that are no longer registered to the lesson.
+        lessonStudents = [str(studentID) for studentID in lessonStudents]
+        for studentID in set(previous.get("students", list())) - set(lessonStudents):
+            self.students.pop(f"{studentID}/{lessonTitle}", None)
+
+        self.lessons[lessonTitle] = {
+            "inputs": {fileName: fingerprint(self._lesson_file(lessonTitle, fileName), previous["inputs"].get(fileName))
+                       for fileName in LESSON_INPUTS},
+            "outputs": {fileName: fingerprint(self._lesson_file(lessonTitle, fileName), previous["outputs"].get(fileName))
+                        for fileName in LESSON_OUTPUTS},
+            "students": lessonStudents,
+        }
+
+
+    def record_student(self, studentID: str, lessonTitle: str) -> None:
+        """Records the current output fingerprints of a student-lesson pair."""
+        self.students[f"{studentID}/{lessonTitle}"] = {
+            fileName: fingerprint(self._student_file(studentID, lessonTitle, fileName)) for fileName in STUDENT_OUTPUTS
+        }
+
+
+    def save(self) -> None:
+        """Writes the manifest to disk, the file is replaced atomically."""
+        os.makedirs(os.path.dirname(self.manifestPath), exist_ok=True)
+        temporaryPath = temporary_path(self.manifestPath)
+        with open(temporaryPath, "w", encoding="utf-8") as file:
+            json.dump({"lessons": self.lessons, "students": self.students}, file, ensure_ascii=False, indent=1)
+        os.replace(temporaryPath, self.manifestPath)
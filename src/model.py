@@ -0,0 +1,211 @@
+# ===============================================
+import numpy as np
+import pandas as pd
+
+from src.instrument import StageTimer
+
+# Derived columns, they are calculated from the inputs and only added back when a table is written.
+ILISKI_DEGERI = "İlişki Değeri"
+TOPLAM = "TOPLAM"
+ORT = "ORT"
+# ===============================================
+
+
+def _column_names(df: pd.DataFrame) -> list:
+    """Returns the column names of a parsed workbook, 'Unnamed: n' placeholders become empty names."""
+    return [column if "Unnamed" not in str(column) else "" for column in df.columns]
+
+
+def value_column_count(columns: list, derivedColumn: str) -> int:
+    """Returns how many columns of a table are inputs, a derived column written by an older run is always the last one."""
+    return len(columns) - 1 if derivedColumn in columns else len(columns)
+
+
+def _row_sums(values: np.ndarray) -> np.ndarray:
+    """
+    Description: Sums every row from left to right.
+    Same addition order as summing the Excel rows cell by cell, so totals are bit for bit the same as before.
+    Parameters:
+        values (np.ndarray) : 2D array.
+    Returns:
+        np.ndarray : Total of every row.
+    """
+    totals = np.zeros(values.shape[0], dtype=np.float64)
+    for column in range(values.shape[1]):
+        totals += values[:, column]
+    return totals
+
+
+def _layout(headerRows: list, labels: list, body: np.ndarray, lastColumn: np.ndarray) -> np.ndarray:
+    """
+    Description: Builds the cells of a table in its Excel layout.
+    Parameters:
+        headerRows (list) : Label rows above the values, every row is a full list of cells.
+        labels (list) : First column of the value rows.
+        body (np.ndarray) : Values, shape (rows × columns).
+        lastColumn (np.ndarray) : Derived column that is appended to the value rows.
+    Returns:
+        np.ndarray : Object array of every cell.
+    """
+    cells = np.empty((len(headerRows) + body.shape[0], body.shape[1] + 2), dtype=object)
+    for rowNumber, headerRow in enumerate(headerRows):
+        cells[rowNumber] = headerRow
+
+    valueRows = slice(len(headerRows), None)
+    cells[valueRows, 0] = labels
+    cells[valueRows, 1:-1] = body
+    cells[valueRows, -1] = lastColumn
+    return cells
+
+
+class LessonModel:
+    """
+    Description: Compact, typed model of a lesson's input tables. The tables must be validated first (see src.validation).
+    Label rows and columns of the workbooks (program/lesson outcomes, assessment names, weights) are kept as metadata,
+    numeric parts are contiguous float64 arrays. Derived columns are calculated once, vectorized.
+    The Excel layout (label rows inlined, derived columns appended) is only built when a table is written.
+
+    Attributes:
+        tableOneColumns (list) : Column names of table1, without 'İlişki Değeri'.
+        prgCiktiLabel (str) : Top-left cell of table1 ('Prg Çıktı').
+        dersCiktiNumbers (list) : Lesson outcome numbers, table1's label row.
+        prgCikti (list) : Program outcomes, table1's first column.
+        relations (np.ndarray) : Table1 values, shape (Prg Çıktı × Ders Çıktı).
+        iliskiDegeri (np.ndarray) : Column 'İlişki Değeri' of table1, shape (Prg Çıktı,).
+        tableTwoColumns (list) : Column names of table2, without 'TOPLAM'.
+        tableTwoLabel (str) : Top-left cell of table2 ('TABLO 2').
+        dersCiktiLabel (str) : Label of table2's and table3's first column ('Ders Çıktı').
+        assessmentNames (list) : Assessment names (Quiz, Vize, ...), table2's second label row.
+        weights (np.ndarray) : Weight of every assessment (sums up to 100), shape (assessments,).
+        dersCikti (list) : Lesson outcomes, table2's first column.
+        coverage (np.ndarray) : Table2 values, shape (Ders Çıktı × assessments).
+        toplam (np.ndarray) : Column 'TOPLAM' of table2, shape (Ders Çıktı,).
+        weighted (np.ndarray) : Table3 values, coverage scaled by the weights, shape (Ders Çıktı × assessments).
+        weightedToplam (np.ndarray) : Column 'TOPLAM' of table3, shape (Ders Çıktı,).
+        gradesColumns (list) : Column names of the grades table, without 'ORT'.
+        studentIds (list) : Student ids, the grades table's first column.
+        grades (np.ndarray) : Grades, shape (students × assessments).
+        ort (np.ndarray) : Column 'ORT' of the grades table, shape (students,).
+
+    Member Functions:
+        _parse_table_one (self: LessonModel, df: pd.DataFrame) -> None: Splits table1 into labels and values.
+        _parse_table_two (self: LessonModel, df: pd.DataFrame) -> None: Splits table2 into labels, weights and values.
+        _parse_grades (self: LessonModel, df: pd.DataFrame) -> None: Splits the grades table into ids and grades.
+        table_one_frame (self: LessonModel) -> pd.DataFrame: Builds table1 in its Excel layout.
+        table_two_frame (self: LessonModel) -> pd.DataFrame: Builds table2 in its Excel layout.
+        table_three_frame (self: LessonModel) -> pd.DataFrame: Builds table3 in its Excel layout.
+        grades_frame (self: LessonModel) -> pd.DataFrame: Builds the grades table in its Excel layout.
+    """
+
+    __slots__ = ("tableOneColumns", "prgCiktiLabel", "dersCiktiNumbers", "prgCikti", "relations", "iliskiDegeri",
+                 "tableTwoColumns", "tableTwoLabel", "dersCiktiLabel", "assessmentNames", "weights", "dersCikti",
+                 "coverage", "toplam", "weighted", "weightedToplam",
+                 "gradesColumns", "studentIds", "grades", "ort")
+
+    def __init__(self, tableOne: pd.DataFrame, tableTwo: pd.DataFrame, tableGrades: pd.DataFrame):
+        self._parse_table_one(tableOne)
+        self._parse_table_two(tableTwo)
+        self._parse_grades(tableGrades)
+
+
+    def _parse_table_one(self, df: pd.DataFrame) -> None:
+        """
+        Description: Splits table1 into its labels and relation values, calculates 'İlişki Değeri'.
+        Parameters:
+            df (pd.DataFrame) : Parsed table1.xlsx.
+        Returns:
+            None
+        """
+        columns = _column_names(df)
+
+        # An 'İlişki Değeri' column written by an older run is recalculated, never read.
+        valueColumns = value_column_count(columns, ILISKI_DEGERI)
+
+        self.tableOneColumns = columns[:valueColumns]
+        self.prgCiktiLabel = df.iat[0, 0]
+        self.dersCiktiNumbers = df.iloc[0, 1:valueColumns].to_list()
+        self.prgCikti = df.iloc[1:, 0].to_list()
+        self.relations = df.iloc[1:, 1:valueColumns].to_numpy(dtype=np.float64)
+
+        # Column 'İlişki Değeri' is the mean relation of every program outcome.
+        self.iliskiDegeri = _row_sums(self.relations) / self.relations.shape[1]
+
+
+    def _parse_table_two(self, df: pd.DataFrame) -> None:
+        """
+        Description: Splits table2 into its labels, assessment weights and values, calculates table2's and table3's 'TOPLAM'.
+        Parameters:
+            df (pd.DataFrame) : Parsed table2.xlsx.
+        Returns:
+            None
+        """
+        columns = _column_names(df)
+
+        # Column 'TOPLAM' is part of the template, it is always recalculated.
+        valueColumns = value_column_count(columns, TOPLAM)
+
+        self.tableTwoColumns = columns[:valueColumns]
+        self.tableTwoLabel = df.iat[0, 0]
+        self.dersCiktiLabel = df.iat[1, 0]
+        self.weights = df.iloc[0, 1:valueColumns].to_numpy(dtype=np.float64)
+        self.assessmentNames = df.iloc[1, 1:valueColumns].to_list()
+        self.dersCikti = df.iloc[2:, 0].to_list()
+        self.coverage = df.iloc[2:, 1:valueColumns].to_numpy(dtype=np.float64)
+
+        self.toplam = _row_sums(self.coverage)
+
+        # Table3 is table2 scaled by the assessment weights.
+        with StageTimer("table3"):
+            self.weighted = (self.coverage * self.weights) / 100
+            self.weightedToplam = _row_sums(self.weighted)
+
+
+    def _parse_grades(self, df: pd.DataFrame) -> None:
+        """
+        Description: Splits the grades table into student ids and grades, calculates 'ORT'.
+        Parameters:
+            df (pd.DataFrame) : Parsed grades.xlsx.
+        Returns:
+            None
+        """
+        columns = _column_names(df)
+
+        # An 'ORT' column written by an older run is recalculated, never read.
+        valueColumns = value_column_count(columns, ORT)
+
+        self.gradesColumns = columns[:valueColumns]
+        self.studentIds = df.iloc[:, 0].to_list()
+        self.grades = df.iloc[:, 1:valueColumns].to_numpy(dtype=np.float64)
+
+        # Column 'ORT' is the weighted mean of the student's grades.
+        self.ort = _row_sums((self.grades * self.weights) / 100)
+
+
+    def table_one_frame(self) -> pd.DataFrame:
+        """Builds table1 in its Excel layout: label row, then every program outcome with its 'İlişki Değeri'."""
+        headerRow = [self.prgCiktiLabel] + self.dersCiktiNumbers + [ILISKI_DEGERI]
+        cells = _layout([headerRow], self.prgCikti, self.relations, self.iliskiDegeri)
+        return pd.DataFrame(cells, columns=self.tableOneColumns + [ILISKI_DEGERI])
+
+
+    def table_two_frame(self) -> pd.DataFrame:
+        """Builds table2 in its Excel layout: weights row, assessment names row, then every lesson outcome with its 'TOPLAM'."""
+        weightsRow = [self.tableTwoLabel] + self.weights.tolist() + [np.nan]
+        namesRow = [self.dersCiktiLabel] + self.assessmentNames + [TOPLAM]
+        cells = _layout([weightsRow, namesRow], self.dersCikti, self.coverage, self.toplam)
+        return pd.DataFrame(cells, columns=self.tableTwoColumns + [TOPLAM])
+
+
+    def table_three_frame(self) -> pd.DataFrame:
+        """Builds table3 in its Excel layout: assessment names row, then every lesson outcome with its 'TOPLAM'."""
+        # Column names are placeholders, the actual keys are in the first row (this improves readability in Excel).
+        columns = [self.dersCiktiLabel, 'TABLO 3'] + ['Ağırlıklı Değerlendirme'] * (len(self.assessmentNames) - 1) + [TOPLAM]
+        namesRow = [self.dersCiktiLabel] + self.assessmentNames + [TOPLAM]
+        cells = _layout([namesRow], self.dersCikti, self.weighted, self.weightedToplam)
+        return pd.DataFrame(cells, columns=columns)
+
+
+    def grades_frame(self) -> pd.DataFrame:
+        """Builds the grades table in its Excel layout: every student with their grades and 'ORT'."""
+        cells = _layout([], self.studentIds, self.grades, self.ort)
+        return pd.DataFrame(cells, columns=self.gradesColumns + [ORT])
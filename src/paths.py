@@ -0,0 +1,55 @@
+# ===============================================
+import os
+import threading
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent.absolute()
+
+# Environment variable that moves the data folder, see set_data_dir().
+# Worker processes inherit it, so they use the same folder no matter how they are started.
+DATA_DIR_VARIABLE = "GRADING_DATA_DIR"
+# ===============================================
+
+
+def _layout(dataDir: str) -> tuple:
+    """Returns (DATA_DIR, LESSONS_DIR, STUDENTS_DIR, CACHE_DIR) of a data folder."""
+    dataDir = os.path.abspath(dataDir)
+    return dataDir, os.path.join(dataDir, "lessons"), os.path.join(dataDir, "students"), os.path.join(dataDir, ".cache")
+
+
+DATA_DIR, LESSONS_DIR, STUDENTS_DIR, CACHE_DIR = _layout(os.environ.get(DATA_DIR_VARIABLE) or os.path.join(ROOT_DIR, "data"))
+
+
+def set_data_dir(dataDir: str) -> None:
+    """
+    Description: Moves the data folder. Modules copy these paths when they are imported,
+    so this must be called before the pipeline (src.main, src.aggregate, ...) is imported.
+    [AFFECTS GLOBAL SCOPE VARIABLES] -> DATA_DIR, LESSONS_DIR, STUDENTS_DIR, CACHE_DIR
+
+    Parameters:
+        dataDir (str): Data folder with 'lessons' and 'students' folders.
+    Returns:
+        None
+    """
+    global DATA_DIR, LESSONS_DIR, STUDENTS_DIR, CACHE_DIR
+    os.environ[DATA_DIR_VARIABLE] = os.path.abspath(dataDir)
+    DATA_DIR, LESSONS_DIR, STUDENTS_DIR, CACHE_DIR = _layout(dataDir)
+
+
+def temporary_path(path: str) -> str:
+    """
+    Description: Returns the name of a temporary file next to 'path', to be renamed over it once it is completely written.
+    The name is unique per process and thread, the UI thread and the pipeline's thread may write the same file at once.
+    The extension is kept, pandas picks the Excel engine from it.
+    Parameters:
+        path (str): File that will be replaced.
+    Returns:
+        str: Temporary file path.
+    """
+    root, extension = os.path.splitext(path)
+    return f"{root}.{os.getpid()}.{threading.get_ident()}.tmp{extension}"
+
+
+def lesson_names() -> list:
+    """Returns the titles of the lessons in the data folder, in a stable order."""
+    return sorted(entry.name for entry in os.scandir(LESSONS_DIR) if entry.is_dir())
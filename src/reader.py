@@ -0,0 +1,105 @@
+# ===============================================
+import os
+import importlib.util
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+
+from src.instrument import count_file
+
+# Calamine (Rust) reader is optional, its engine is only offered if python-calamine is installed.
+CALAMINE_AVAILABLE = importlib.util.find_spec("python_calamine") is not None
+# ===============================================
+
+
+def _convert_value(value):
+    """Converts a cell value the same way pandas' openpyxl reader does: empty -> "", error -> NaN, 3.0 -> 3."""
+    if value is None:
+        return ""
+    if type(value) is float:
+        return int(value) if value.is_integer() else value
+    if type(value) is str and value in ERROR_CODES:
+        return float("nan")
+    return value
+
+
+def _read_pandas_openpyxl(excelPath: str, usecols: list = None) -> pd.DataFrame:
+    """Reference engine, pandas' own openpyxl reader converts every cell object one by one."""
+    return pd.read_excel(excelPath, sheet_name=0, usecols=usecols, engine="openpyxl")
+
+
+def _read_calamine(excelPath: str, usecols: list = None) -> pd.DataFrame:
+    """Calamine engine, the workbook is parsed in Rust."""
+    return pd.read_excel(excelPath, sheet_name=0, usecols=usecols, engine="calamine")
+
+
+def _read_openpyxl_streaming(excelPath: str, usecols: list = None) -> pd.DataFrame:
+    """
+    Description: Streams the first sheet's values with a read-only openpyxl workbook, no cell objects are created.
+    Only the used range is parsed: rows past the last non-empty row are dropped, and with 'usecols' the columns
+    after the last needed one are never read. The rows go through pandas' TextParser, so dtypes and column names
+    are the same as pd.read_excel.
+    Parameters:
+        excelPath (str) : Path to the xlsx file.
+        usecols (list) : Positions of the columns to keep, all columns if None.
+    Returns:
+        pd.DataFrame : Parsed sheet.
+    """
+    workbook = load_workbook(excelPath, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+
+        # Saved dimensions may be missing or wrong, let openpyxl find the used range itself.
+        sheet.reset_dimensions()
+        maxColumn = max(usecols) + 1 if usecols else None
+
+        data = list()
+        lastRowWithData = -1
+        for rowNumber, values in enumerate(sheet.iter_rows(max_col=maxColumn, values_only=True)):
+            row = [_convert_value(value) for value in values]
+
+            # Trim trailing empty cells.
+            while row and row[-1] == "":
+                row.pop()
+            if row:
+                lastRowWithData = rowNumber
+            data.append(row)
+    finally:
+        workbook.close()
+
+    # Trim trailing empty rows and extend every row to the widest one.
+    data = data[:lastRowWithData + 1]
+    if not data:
+        return pd.DataFrame()
+    width = max(len(row) for row in data)
+    data = [row + [""] * (width - len(row)) for row in data]
+
+    return TextParser(data, header=0, usecols=usecols, skip_blank_lines=False).read()
+
+
+# Engine name -> reader function, every engine returns the same dataframe as pd.read_excel(excelPath, sheet_name=0).
+READERS = {"openpyxl": _read_pandas_openpyxl, "openpyxl-streaming": _read_openpyxl_streaming}
+if CALAMINE_AVAILABLE:
+    READERS["calamine"] = _read_calamine
+
+# Engine used when none is given: XLSX_READER environment variable, else the fastest installed engine.
+DEFAULT_READER = os.environ.get("XLSX_READER", "calamine" if CALAMINE_AVAILABLE else "openpyxl-streaming")
+
+
+def read_excel(excelPath: str, engine: str = None, usecols: list = None) -> pd.DataFrame:
+    """
+    Description: Reads the first sheet of a workbook with the given engine.
+    Parameters:
+        excelPath (str) : Path to the xlsx file.
+        engine (str) : One of READERS, DEFAULT_READER if None.
+        usecols (list) : Positions of the columns to keep, all columns if None.
+    Returns:
+        pd.DataFrame : Parsed sheet.
+    """
+    engine = engine or DEFAULT_READER
+    if engine not in READERS:
+        raise ValueError(f"Unknown or unavailable xlsx reader '{engine}', available: {', '.join(READERS)}")
+    count_file("Read", excelPath)
+    return READERS[engine](excelPath, usecols)
@@ -1,17 +1,29 @@
 # ===============================================
 import os
+import threading
 import pandas as pd
-from pathlib import Path
+from collections import Counter, OrderedDict
 
-ROOT_DIR = Path(__file__).parent.parent.absolute()
-DATA_DIR = f'{ROOT_DIR}\\data'
-LESSON_NAMES = os.listdir(f'{DATA_DIR}\\lessons')
+from src.cache import read_excel_cached
+from src.writer import write_excel, write_excels_atomic
+from src.paths import LESSONS_DIR
+from src.model import TOPLAM, ORT, value_column_count
+from src.validation import ValidationReport
+
+# En son kullanılan kaç dersin isim ve yüzdeliklerinin bellekte tutulacağı
+METADATA_CACHE_SIZE = 64
+# table2 yolu -> ((mtime, boyut), isimler, yüzdelikler), en eski kullanılan en başta
+_METADATA_CACHE = OrderedDict()
+# Arayüz önbelleği okurken değişiklikler arka plandaki iş parçacığında yazılıp önbellekten silinir
+_METADATA_LOCK = threading.Lock()
+# Bu çalışmadaki bellek içi önbellek isabetleri
+METADATA_STATS = Counter()
 # ===============================================
 
 
 def rearrange_dataframe(excelPath: str) -> pd.DataFrame:
     # Halihazırda bulunan yüzdelik (yüzdeliğin getter fonksiyonunu böyle yazabilirsin)
-    dfUnedited = pd.read_excel(excelPath, sheet_name=0)
+    dfUnedited = read_excel_cached(excelPath)
 
     # Yüzdelikleri al
     currentPercentages = dfUnedited.iloc[0, 1:-1].tolist()
@@ -34,40 +46,253 @@ def rearrange_dataframe(excelPath: str) -> pd.DataFrame:
 
     return dfFinal
 
+# =============================================== Edit session
+def _blank_placeholders(df: pd.DataFrame) -> pd.DataFrame:
+    # pandas boş başlık hücrelerini 'Unnamed: n' olarak okur, yazmadan önce tekrar boş yap
+    return df.set_axis([column if "Unnamed" not in str(column) else "" for column in df.columns], axis=1)
+
+
+class LessonEditSession:
+    """
+    Description: Batch edit of a lesson's assessment names and weights.
+    table2.xlsx is parsed once, every change is applied in memory and commit() validates and writes it once, atomically.
+    Renamed assessments are also renamed in grades.xlsx's header, otherwise the lesson would no longer validate.
+
+    Attributes:
+        lessonTitle (str) : Title of the edited lesson.
+        tableTwoPath (str) : Path to table2.xlsx.
+        gradesPath (str) : Path to grades.xlsx.
+        tableTwo (pd.DataFrame) : Parsed table2, row 0 holds the weights and row 1 the assessment names.
+        assessmentCount (int) : Number of assessments (table2's value columns without the first one).
+
+    Member Functions:
+        column_names (self: LessonEditSession) -> list: Returns the assessment names.
+        percentages (self: LessonEditSession) -> list: Returns the assessment weights.
+        get_percentage (self: LessonEditSession, columnName: str) -> int: Returns an assessment's weight.
+        rename_column (self: LessonEditSession, old_name: str, new_name: str) -> None: Renames an assessment.
+        set_column_names (self: LessonEditSession, names: list) -> None: Renames every assessment.
+        set_percentage (self: LessonEditSession, columnName: str, percentage: int) -> None: Changes an assessment's weight.
+        set_percentages (self: LessonEditSession, percentages: list) -> None: Changes every assessment's weight.
+        validate (self: LessonEditSession) -> ValidationReport: Checks the edited names and weights.
+        commit (self: LessonEditSession) -> bool: Validates and writes the changes, returns False if nothing changed.
+    """
+
+    def __init__(self, lessonTitle: str, lessons_dir: str = LESSONS_DIR):
+        self.lessonTitle = lessonTitle
+        self.tableTwoPath = os.path.join(lessons_dir, lessonTitle, "table2.xlsx")
+        self.gradesPath = os.path.join(lessons_dir, lessonTitle, "grades.xlsx")
+
+        # Tek okuma, bütün değişiklikler bu df üzerinde yapılır
+        self.tableTwo = read_excel_cached(self.tableTwoPath)
+        self.assessmentCount = value_column_count(self.tableTwo.columns.tolist(), TOPLAM) - 1
+
+        self._originalNames = self.column_names()
+        self._originalPercentages = self.percentages()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback) -> None:
+        # Hata yoksa değişiklikleri yaz, hata varsa dosyaya dokunma
+        if excType is None:
+            self.commit()
+
+
+    def _position(self, columnName: str) -> int:
+        """Returns the column of an assessment in tableTwo, raises KeyError if the lesson has no such assessment."""
+        names = self.column_names()
+        if columnName not in names:
+            raise KeyError(f"'{columnName}' kolon adı bulunamadı!")
+        return names.index(columnName) + 1
+
+
+    def column_names(self) -> list:
+        """Returns the assessment names (table2's names row without 'Ders Çıktı' and 'TOPLAM')."""
+        return self.tableTwo.iloc[1, 1:self.assessmentCount + 1].tolist()
+
+
+    def percentages(self) -> list:
+        """Returns the assessment weights in the order of column_names()."""
+        return self.tableTwo.iloc[0, 1:self.assessmentCount + 1].tolist()
+
+
+    def get_percentage(self, columnName: str) -> int:
+        """Returns the weight of an assessment."""
+        return self.tableTwo.iat[0, self._position(columnName)]
+
+
+    def rename_column(self, old_name: str, new_name: str) -> None:
+        """Renames an assessment, the change is written by commit()."""
+        self.tableTwo.iat[1, self._position(old_name)] = new_name
+
+
+    def set_column_names(self, names: list) -> None:
+        """Renames every assessment, 'names' must have a name for every assessment in order."""
+        if len(names) != self.assessmentCount:
+            raise ValueError(f"{self.assessmentCount} sütun ismi bekleniyordu, {len(names)} verildi.")
+        for position, name in enumerate(names, start=1):
+            self.tableTwo.iat[1, position] = name
+
+
+    def set_percentage(self, columnName: str, percentage: int) -> None:
+        """Changes the weight of an assessment, the weights are checked by commit()."""
+        self.tableTwo.iat[0, self._position(columnName)] = percentage
+
+
+    def set_percentages(self, percentages: list) -> None:
+        """Changes every assessment's weight, 'percentages' must have a weight for every assessment in order."""
+        if len(percentages) != self.assessmentCount:
+            raise ValueError(f"{self.assessmentCount} yüzdelik bekleniyordu, {len(percentages)} verildi.")
+        for position, percentage in enumerate(percentages, start=1):
+            self.tableTwo.iat[0, position] = percentage
+
+
+    def validate(self) -> ValidationReport:
+        """
+        Description: Checks the edited table2: every assessment has a unique name and a non-negative weight, the weights sum to 100.
+        Parameters:
+            self (LessonEditSession) : LessonEditSession object.
+        Returns:
+            ValidationReport : Every problem found, empty if the changes can be written.
+        """
+        report = ValidationReport()
+        names = [str(name).strip() if pd.notna(name) else "" for name in self.column_names()]
+        if "" in names:
+            report.add("table2.xlsx", None, "Assessment name is missing.")
+        duplicates = sorted({name for name in names if name and names.count(name) > 1})
+        if duplicates:
+            report.add("table2.xlsx", None, f"Assessment names must be unique (repeated: {', '.join(duplicates)}).")
+
+        weights = pd.to_numeric(pd.Series(self.percentages(), dtype=object), errors="coerce")
+        if weights.isna().any() or (weights < 0).any():
+            report.add("table2.xlsx", None, f"Grading weights must be non-negative numbers (found: {self.percentages()}).")
+        elif weights.sum() != 100:
+            report.add("table2.xlsx", None, f"Grading weights must sum to 100 (found: {weights.sum():g}).")
+        return report
+
+
+    def commit(self) -> bool:
+        """
+        Description: Validates the changes and writes them, table2.xlsx once and grades.xlsx only if an assessment was renamed.
+        Parameters:
+            self (LessonEditSession) : LessonEditSession object.
+        Returns:
+            bool : True if anything was written, False if nothing changed.
+        Raises:
+            LessonValidationError : If the edited names or weights are invalid, nothing is written then.
+        """
+        names = self.column_names()
+        if names == self._originalNames and self.percentages() == self._originalPercentages:
+            return False
+        self.validate().raise_if_invalid()
+
+        # Okunan tablodaki boş başlıklar 'Unnamed: n' olur, şablon bozulmasın diye tekrar boş yazılır
+        tables = [(_blank_placeholders(self.tableTwo), self.tableTwoPath)]
+
+        # Notların başlıkları table2'deki isimlerle aynı olmalı, isim değiştiyse onları da değiştir
+        if names != self._originalNames:
+            grades = read_excel_cached(self.gradesPath)
+            gradeColumns = value_column_count(grades.columns.tolist(), ORT)
+            grades.columns = [grades.columns[0]] + names + grades.columns[gradeColumns:].tolist()
+            tables.append((_blank_placeholders(grades), self.gradesPath))
+
+        # İki dosya birlikte yazılır, biri yazılamazsa ikisi de eski haliyle kalır
+        write_excels_atomic(tables)
+        # mtime çözünürlüğü kaba olan dosya sistemlerinde eski bilgi kalmasın
+        invalidate_lesson_metadata(self.tableTwoPath)
+        self._originalNames = names
+        self._originalPercentages = self.percentages()
+        return True
+
+# =============================================== Metadata cache
+def lesson_metadata(lessonTitle: str, lessons_dir: str = LESSONS_DIR) -> tuple:
+    """
+    Description: Returns a lesson's assessment names and weights, table2.xlsx is parsed only if it changed since the last call.
+    An entry is valid while table2's mtime and size stay the same, the least recently used lessons are dropped
+    when more than METADATA_CACHE_SIZE lessons are cached.
+    Parameters:
+        lessonTitle (str) : Title of the lesson.
+        lessons_dir (str) : Folder of the lessons.
+    Returns:
+        tuple : (assessment names (list), weights (list)), copies that can be modified.
+    Raises:
+        FileNotFoundError : If the lesson has no table2.xlsx.
+    """
+    tableTwoPath = os.path.abspath(os.path.join(lessons_dir, lessonTitle, "table2.xlsx"))
+    stat = os.stat(tableTwoPath)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _METADATA_LOCK:
+        entry = _METADATA_CACHE.get(tableTwoPath)
+        if entry is not None and entry[0] == signature:
+            METADATA_STATS["hits"] += 1
+            _METADATA_CACHE.move_to_end(tableTwoPath)
+            return list(entry[1]), list(entry[2])
+
+    # Tablo kilit dışında okunur, yavaş bir okuma diğer iş parçacığını bekletmesin
+    METADATA_STATS["misses"] += 1
+    session = LessonEditSession(lessonTitle, lessons_dir)
+    entry = (signature, session.column_names(), session.percentages())
+
+    with _METADATA_LOCK:
+        _METADATA_CACHE[tableTwoPath] = entry
+
+        # LRU sınırı, en uzun süredir kullanılmayan dersi çıkar
+        while len(_METADATA_CACHE) > METADATA_CACHE_SIZE:
+            _METADATA_CACHE.popitem(last=False)
+
+    return list(entry[1]), list(entry[2])
+
+
+def invalidate_lesson_metadata(tableTwoPath: str = None) -> None:
+    """Drops a lesson's cached names and weights (given by its table2.xlsx path), or every lesson's if no path is given."""
+    with _METADATA_LOCK:
+        if tableTwoPath is None:
+            _METADATA_CACHE.clear()
+        else:
+            _METADATA_CACHE.pop(os.path.abspath(tableTwoPath), None)
+
+
+def _is_lesson(lessonTitle: str) -> bool:
+    # Klasör her seferinde kontrol edilir, arayüzden eklenen veya adı değişen dersler de görülür
+    return os.path.isfile(os.path.join(LESSONS_DIR, lessonTitle, "table2.xlsx"))
+
 # =============================================== Setter/Getters
+# Tek değişiklik için kısayollar, birden fazla değişiklik için LessonEditSession kullan
 def get_column_names(lessonTitle: str) -> list:
-    if lessonTitle in LESSON_NAMES:
-        df = rearrange_dataframe(f"{DATA_DIR}\\lessons\\{lessonTitle}\\table2.xlsx")
-        columnsList = df.columns.tolist()
-        columnsList.pop(0), columnsList.pop(-1)
-        return columnsList
+    if _is_lesson(lessonTitle):
+        return lesson_metadata(lessonTitle)[0]
 
 def get_percentage(lessonTitle: str, columnName: str) -> int:
-    if lessonTitle in LESSON_NAMES:
-        df = rearrange_dataframe(f"{DATA_DIR}\\lessons\\{lessonTitle}\\table2.xlsx")
-        currentPercentage = df.loc[0, columnName]
-        return currentPercentage
+    if _is_lesson(lessonTitle):
+        names, percentages = lesson_metadata(lessonTitle)
+        if columnName not in names:
+            raise KeyError(f"'{columnName}' kolon adı bulunamadı!")
+        return percentages[names.index(columnName)]
 
-def set_percentage(lessonTitle: str, columnName: str, percentage: int) -> None:
-    if lessonTitle in LESSON_NAMES:
-        df = rearrange_dataframe(f"{DATA_DIR}\\lessons\\{lessonTitle}\\table2.xlsx")
-        df.loc[0, columnName] = percentage
+def set_percentages(lessonTitle: str, percentages: list) -> None:
+    # Tek başına bir yüzdeliği değiştirmek toplamı 100'den çıkarır, bu yüzden yüzdeliklerin hepsi birlikte verilir
+    if _is_lesson(lessonTitle):
+        with LessonEditSession(lessonTitle) as session:
+            session.set_percentages(percentages)
 
 def set_column_name(lessonTitle: str, new_name: str, old_name: str) -> pd.DataFrame:
-    file_path = f"{DATA_DIR}\\lessons\\{lessonTitle}\\table2.xlsx"
-    df = pd.read_excel(file_path)
+    session = LessonEditSession(lessonTitle)
 
-    if old_name not in df.columns:
+    if old_name not in session.column_names():
         print(f"'{old_name}' kolon adı bulunamadı!")
-        return df  # Return the original DataFrame if the column is not found
+        return session.tableTwo  # Return the original DataFrame if the column is not found
     else:
-        df.rename(columns={old_name: new_name}, inplace=True)
-        return df
+        session.rename_column(old_name, new_name)
+        session.commit()
+        return session.tableTwo
 
 def write_to_excel(lessonTitle: str, df:pd.DataFrame) -> None:
-    file_path = f"{DATA_DIR}\\lessons\\{lessonTitle}\\table2.xlsx"
+    file_path = os.path.join(LESSONS_DIR, lessonTitle, "table2.xlsx")
 
     # indexleri sıfırlama bir nevi ignore yerine sayılabilir
     df.reset_index(drop=True, inplace=True)
 
-    df.to_excel(file_path, index=False)
+    write_excel(df, file_path)
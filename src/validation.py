@@ -0,0 +1,202 @@
+# ===============================================
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+from src.model import ILISKI_DEGERI, TOPLAM, ORT, value_column_count
+from src.reader import read_excel
+
+# Row 1 of a workbook is the header, so row 0 of a parsed table is Excel row 2.
+FIRST_DATA_ROW = 2
+# ===============================================
+
+
+class ValidationReport:
+    """
+    Description: Every problem found in a lesson's input tables, collected in one pass instead of stopping at the first one.
+
+    Attributes:
+        errors (list) : (file name, cell address or None, message) tuples.
+
+    Member Functions:
+        is_valid (self: ValidationReport) -> bool: Checks if no problem was found.
+        add (self: ValidationReport, fileName: str, cell: str | None, message: str) -> None: Adds a problem.
+        add_cells (self: ValidationReport, fileName: str, mask: np.ndarray, values: np.ndarray, rowOffset: int, columnOffset: int, message: str) -> None: Adds a problem for every marked cell.
+        summary (self: ValidationReport, limit: int) -> str: Formats the first 'limit' problems.
+        raise_if_invalid (self: ValidationReport) -> None: Raises LessonValidationError if there is any problem.
+    """
+
+    def __init__(self):
+        self.errors = list()
+
+
+    def is_valid(self) -> bool:
+        """Returns True if no problem was found."""
+        return not self.errors
+
+
+    def __str__(self) -> str:
+        return self.summary()
+
+
+    def add(self, fileName: str, cell, message: str) -> None:
+        """Adds a problem, 'cell' is an Excel address like 'B3' or None if the problem is not about a single cell."""
+        self.errors.append((fileName, cell, message))
+
+
+    def add_cells(self, fileName: str, mask: np.ndarray, values: np.ndarray,
+                  rowOffset: int, columnOffset: int, message: str) -> None:
+        """
+        Description: Adds a problem for every cell marked in a mask.
+        Parameters:
+            fileName (str) : Workbook the cells belong to.
+            mask (np.ndarray) : Boolean mask of the bad cells.
+            values (np.ndarray) : Original cell values, same shape as the mask.
+            rowOffset (int) : Row of the mask's first row in the parsed table.
+            columnOffset (int) : Column of the mask's first column in the parsed table.
+            message (str) : Problem description.
+        Returns:
+            None
+        """
+        for row, column in zip(*np.nonzero(mask)):
+            cell = f"{get_column_letter(column + columnOffset + 1)}{row + rowOffset + FIRST_DATA_ROW}"
+            self.add(fileName, cell, f"{message} (found: {values[row, column]!r})")
+
+
+    def summary(self, limit: int = None) -> str:
+        """
+        Description: Formats the problems, one per line.
+        Parameters:
+            limit (int) : Maximum number of problems to list, all of them if None.
+        Returns:
+            str : Formatted report.
+        """
+        lines = [f"{fileName} {cell}: {message}" if cell else f"{fileName}: {message}"
+                 for fileName, cell, message in self.errors[:limit]]
+        if limit is not None and len(self.errors) > limit:
+            lines.append(f"... and {len(self.errors) - limit} more.")
+        return "\n".join(lines)
+
+
+    def raise_if_invalid(self) -> None:
+        """Raises LessonValidationError with the whole report if any problem was found."""
+        if self.errors:
+            raise LessonValidationError(self)
+
+
+class LessonValidationError(ValueError):
+    """Raised when a lesson's input tables are invalid, 'report' lists every problem."""
+
+    def __init__(self, report: ValidationReport):
+        super().__init__(f"Invalid lesson tables:\n{report.summary()}")
+        self.report = report
+
+
+    def __reduce__(self):
+        # Lessons are validated in worker processes, the exception must come back with its report, not only the message.
+        return self.__class__, (self.report,)
+
+
+def _numeric(block: pd.DataFrame) -> np.ndarray:
+    """Converts a block of cells into float64, cells that are not numbers become NaN."""
+    return block.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+
+
+def validate_lesson(tableOne: pd.DataFrame, tableTwo: pd.DataFrame, tableGrades: pd.DataFrame) -> ValidationReport:
+    """
+    Description: Validates a lesson's parsed input tables with vectorized masks, every bad cell is reported.
+    Checks: table1 relations are numbers in [0, 1], table2 has at least 3 assessments with numeric weights summing
+    to 100, the grades table has the same assessments as table2 and its grades are numbers in [0, 100],
+    table1 and table2 have the same number of lesson outcomes.
+    Derived columns written by older runs ('İlişki Değeri', 'TOPLAM', 'ORT') are ignored.
+    Parameters:
+        tableOne (pd.DataFrame) : Parsed table1.xlsx.
+        tableTwo (pd.DataFrame) : Parsed table2.xlsx.
+        tableGrades (pd.DataFrame) : Parsed grades.xlsx.
+    Returns:
+        ValidationReport : Every problem found, empty if the tables are valid.
+    """
+    report = ValidationReport()
+
+    # Table1: label row, then one row per program outcome with a relation value per lesson outcome.
+    tableOneColumns = value_column_count(tableOne.columns.tolist(), ILISKI_DEGERI)
+    if tableOne.shape[0] < 2 or tableOneColumns < 2:
+        report.add("table1.xlsx", None, "Table1 must have a label row, a program outcome row and a lesson outcome column.")
+    else:
+        cells = tableOne.iloc[1:, 1:tableOneColumns]
+        relations = _numeric(cells)
+        report.add_cells("table1.xlsx", np.isnan(relations) | (relations < 0) | (relations > 1), cells.to_numpy(),
+                         1, 1, "Table1's values must be numbers in between 0 and 1.")
+
+    # Table2: weights row, assessment names row, then one row per lesson outcome.
+    assessmentCount = value_column_count(tableTwo.columns.tolist(), TOPLAM) - 1
+    if tableTwo.shape[0] < 3 or assessmentCount < 1:
+        report.add("table2.xlsx", None, "Table2 must have a weights row, a names row and a lesson outcome row.")
+        return report
+
+    if assessmentCount < 3:
+        report.add("table2.xlsx", None, f"Table2 must have at least 3 columns (found: {assessmentCount}).")
+
+    weightCells = tableTwo.iloc[[0], 1:assessmentCount + 1]
+    weights = _numeric(weightCells)
+    weightsMask = np.isnan(weights) | (weights < 0)
+    report.add_cells("table2.xlsx", weightsMask, weightCells.to_numpy(), 0, 1, "Grading weights must be non-negative numbers.")
+    if not weightsMask.any() and weights.sum() != 100:
+        report.add("table2.xlsx", None, f"Grading weights must sum to 100 (found: {weights.sum():g}).")
+
+    nameCells = tableTwo.iloc[[1], 1:assessmentCount + 1]
+    report.add_cells("table2.xlsx", nameCells.isna().to_numpy(), nameCells.to_numpy(), 1, 1, "Assessment name is missing.")
+
+    coverageCells = tableTwo.iloc[2:, 1:assessmentCount + 1]
+    report.add_cells("table2.xlsx", np.isnan(_numeric(coverageCells)), coverageCells.to_numpy(), 2, 1,
+                     "Table2's values must be numbers.")
+
+    # Table1 has a column, table2 has a row for every lesson outcome.
+    if tableOne.shape[0] >= 2 and tableOneColumns - 1 != tableTwo.shape[0] - 2:
+        report.add("table1.xlsx", None, f"Table1 has {tableOneColumns - 1} lesson outcomes, "
+                                        f"table2 has {tableTwo.shape[0] - 2}.")
+
+    # Grades: student id, then one column per assessment of table2 in the same order.
+    gradeColumns = value_column_count(tableGrades.columns.tolist(), ORT)
+    if gradeColumns - 1 != assessmentCount:
+        report.add("grades.xlsx", None, f"Table2 and TableGrades column counts must be the same "
+                                        f"(table2: {assessmentCount}, grades: {gradeColumns - 1}).")
+    else:
+        for column, (gradeName, assessmentName) in enumerate(zip(tableGrades.columns[1:gradeColumns],
+                                                                  tableTwo.iloc[1, 1:assessmentCount + 1]), start=2):
+            if str(gradeName).strip() != str(assessmentName).strip():
+                report.add("grades.xlsx", f"{get_column_letter(column)}1",
+                           f"Column must be table2's assessment '{assessmentName}' (found: {gradeName!r}).")
+
+    idCells = tableGrades.iloc[:, [0]]
+    report.add_cells("grades.xlsx", idCells.isna().to_numpy(), idCells.to_numpy(), 0, 0, "Student id is missing.")
+
+    gradeCells = tableGrades.iloc[:, 1:gradeColumns]
+    grades = _numeric(gradeCells)
+    report.add_cells("grades.xlsx", np.isnan(grades) | (grades < 0) | (grades > 100), gradeCells.to_numpy(), 0, 1,
+                     "Grades must be numbers in between 0 and 100.")
+
+    return report
+
+
+def validate_lesson_files(tableOnePath: str, tableTwoPath: str, gradesPath: str) -> ValidationReport:
+    """
+    Description: Reads and validates a lesson's input workbooks, e.g. right after they are uploaded.
+    Parameters:
+        tableOnePath (str) : Path to table1.xlsx.
+        tableTwoPath (str) : Path to table2.xlsx.
+        gradesPath (str) : Path to grades.xlsx.
+    Returns:
+        ValidationReport : Every problem found, empty if the workbooks are valid.
+    """
+    tables = dict()
+    report = ValidationReport()
+    for fileName, excelPath in (("table1.xlsx", tableOnePath), ("table2.xlsx", tableTwoPath), ("grades.xlsx", gradesPath)):
+        try:
+            tables[fileName] = read_excel(excelPath)
+        except Exception as e:
+            report.add(fileName, None, f"Workbook can't be read: {e}")
+
+    if report.errors:
+        return report
+    return validate_lesson(tables["table1.xlsx"], tables["table2.xlsx"], tables["grades.xlsx"])
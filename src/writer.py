@@ -0,0 +1,318 @@
+# ===============================================
+import os
+import math
+import time
+import numbers
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from openpyxl import Workbook
+
+from src.instrument import count, count_file
+from src.cache import read_excel_cached
+from src.paths import temporary_path
+
+# xlsxwriter is optional, its backend is only offered if it is installed.
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+LOGGER = logging.getLogger(__name__)
+
+# Name of the sheet that DataFrame.to_excel writes into.
+SHEET_NAME = "Sheet1"
+# Relative difference under which a number read back from a workbook is the same as the number that was written.
+FLOAT_TOLERANCE = 1e-12
+# ===============================================
+
+
+def _rows(df: pd.DataFrame):
+    """Yields the header row and then every row of the dataframe, missing values become empty cells like in to_excel."""
+    yield df.columns.tolist()
+    values = df.astype(object).where(df.notna(), None)
+    yield from values.itertuples(index=False, name=None)
+
+
+def _write_openpyxl(df: pd.DataFrame, excelPath: str) -> None:
+    """Default backend, builds the whole workbook in memory."""
+    df.to_excel(excelPath, index=False)
+
+
+def _write_openpyxl_write_only(df: pd.DataFrame, excelPath: str) -> None:
+    """openpyxl write-only workbook, rows are streamed into the sheet and never kept as cell objects."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET_NAME)
+    for row in _rows(df):
+        sheet.append(row)
+    workbook.save(excelPath)
+
+
+def _write_xlsxwriter(df: pd.DataFrame, excelPath: str) -> None:
+    """xlsxwriter in constant memory mode, every row is flushed to disk as soon as the next one starts."""
+    workbook = xlsxwriter.Workbook(excelPath, {"constant_memory": True})
+    sheet = workbook.add_worksheet(SHEET_NAME)
+    for rowNumber, row in enumerate(_rows(df)):
+        sheet.write_row(rowNumber, 0, row)
+    workbook.close()
+
+
+# Backend name -> writer function, every backend writes the same header row and cells as to_excel(index=False).
+BACKENDS = {"openpyxl": _write_openpyxl, "openpyxl-write-only": _write_openpyxl_write_only}
+if xlsxwriter is not None:
+    BACKENDS["xlsxwriter"] = _write_xlsxwriter
+
+# Backend used when none is given, can be set with the XLSX_BACKEND environment variable.
+DEFAULT_BACKEND = os.environ.get("XLSX_BACKEND", "openpyxl")
+
+
+def write_excel(df: pd.DataFrame, excelPath: str, backend: str = None) -> None:
+    """
+    Description: Writes a dataframe into an xlsx file with the given backend, same layout as df.to_excel(excelPath, index=False).
+    Parameters:
+        df (pd.DataFrame) : Table to write.
+        excelPath (str) : Path to the xlsx file.
+        backend (str) : One of BACKENDS, DEFAULT_BACKEND if None.
+    Returns:
+        None
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown or unavailable xlsx backend '{backend}', available: {', '.join(BACKENDS)}")
+    BACKENDS[backend](df, excelPath)
+    count_file("Written", excelPath)
+
+
+def same_cells(df: pd.DataFrame, parsed: pd.DataFrame) -> bool:
+    """
+    Description: Checks if writing a dataframe would produce the cells a workbook already has.
+    Parameters:
+        df (pd.DataFrame) : Table to write, empty header cells are "".
+        parsed (pd.DataFrame) : The workbook as parsed, empty header cells are 'Unnamed: n' placeholders.
+    Returns:
+        bool : True if every header and cell is the same, 3 and 3.0 are the same number and empty cells match empty cells.
+    """
+    if df.shape != parsed.shape:
+        return False
+    if df.columns.tolist() != [column if "Unnamed" not in str(column) else "" for column in parsed.columns]:
+        return False
+
+    left = df.to_numpy(dtype=object)
+    right = parsed.to_numpy(dtype=object)
+    equal = (left == right) | (pd.isna(left) & pd.isna(right))
+
+    # xlsx keeps fewer digits than float64 (0.22000000000000003 is read back as 0.22), such numbers are the same cell.
+    for row, column in zip(*np.nonzero(~equal)):
+        first, second = left[row, column], right[row, column]
+        if not (isinstance(first, numbers.Real) and isinstance(second, numbers.Real)
+                and math.isclose(first, second, rel_tol=FLOAT_TOLERANCE, abs_tol=FLOAT_TOLERANCE)):
+            return False
+    return True
+
+
+def is_unchanged(df: pd.DataFrame, excelPath: str) -> bool:
+    """
+    Description: Checks if a workbook already exists with the cells that writing the dataframe would produce.
+    Parameters:
+        df (pd.DataFrame) : Table to write.
+        excelPath (str) : Path to the xlsx file.
+    Returns:
+        bool : True if writing the dataframe would not change the workbook.
+    """
+    # The comparison is not an input read, it is neither counted in the parse cache statistics nor saved.
+    return os.path.exists(excelPath) and same_cells(df, read_excel_cached(excelPath, save=False, countStats=False))
+
+
+def write_excel_if_changed(df: pd.DataFrame, excelPath: str, backend: str = None) -> bool:
+    """
+    Description: Writes a dataframe into an xlsx file, unless the file already has the same cells.
+    Rewriting an unchanged workbook would change its bytes and mtime, so every run would miss the parse cache.
+    Parameters:
+        df (pd.DataFrame) : Table to write.
+        excelPath (str) : Path to the xlsx file.
+        backend (str) : One of BACKENDS, DEFAULT_BACKEND if None.
+    Returns:
+        bool : True if the file was written.
+    """
+    if is_unchanged(df, excelPath):
+        count("filesUnchanged")
+        return False
+    write_excel(df, excelPath, backend)
+    return True
+
+
+def write_excel_atomic(df: pd.DataFrame, excelPath: str, backend: str = None) -> None:
+    """
+    Description: Same as write_excel, but the table is written into a temporary file that then replaces the workbook,
+    so a crash or a concurrent reader never sees a half-written input table.
+    Parameters:
+        df (pd.DataFrame) : Table to write.
+        excelPath (str) : Path to the xlsx file.
+        backend (str) : One of BACKENDS, DEFAULT_BACKEND if None.
+    Returns:
+        None
+    """
+    write_excels_atomic([(df, excelPath)], backend)
+
+
+def write_excels_atomic(tables: list, backend: str = None) -> None:
+    """
+    Description: Writes several workbooks all or nothing. Every table is first written into a temporary file,
+    the workbooks are only replaced once all of them were written. If any write fails, no workbook is touched.
+    Parameters:
+        tables (list) : (df, excelPath) pairs.
+        backend (str) : One of BACKENDS, DEFAULT_BACKEND if None.
+    Returns:
+        None
+    """
+    temporaryPaths = list()
+    try:
+        for df, excelPath in tables:
+            temporaryPaths.append(temporary_path(excelPath))
+            write_excel(df, temporaryPaths[-1], backend)
+
+        # Renames are cheap and don't fail for the reasons a write does (disk full, bad cell value).
+        for temporaryPath, (_, excelPath) in zip(temporaryPaths, tables):
+            os.replace(temporaryPath, excelPath)
+    finally:
+        for temporaryPath in temporaryPaths:
+            if os.path.exists(temporaryPath):
+                os.remove(temporaryPath)
+
+
+def _write_frame(df: pd.DataFrame, excelPath: str, backend: str = None) -> tuple:
+    """
+    Description: Writes a dataframe into an xlsx file and measures how long it took.
+    Parameters:
+        df (pd.DataFrame) : Rendered table.
+        excelPath (str) : Path to the xlsx file.
+        backend (str) : xlsx backend.
+    Returns:
+        tuple : (excelPath, seconds spent writing)
+    """
+    start = time.perf_counter()
+    write_excel(df, excelPath, backend)
+    return excelPath, time.perf_counter() - start
+
+
+class WriterPool:
+    """
+    Description: Output stage that writes rendered tables from a bounded pool of worker processes.
+    Serializing xlsx is CPU bound, so the writers are processes, not threads.
+    submit() blocks while 'maxPending' tables are queued, so rendering can't run ahead of the disk (back-pressure).
+    With a single worker, tables are written right away on the calling thread.
+
+    Attributes:
+        maxWorkers (int) : Number of writer processes.
+        maxPending (int) : Maximum number of queued tables.
+        backend (str) : xlsx backend the tables are written with.
+        latencies (dict) : File path -> seconds spent writing it.
+        errors (list) : Exceptions raised by the writers.
+
+    Member Functions:
+        submit (self: WriterPool, df: pd.DataFrame, excelPath: str) -> None: Queues a table to be written.
+        flush (self: WriterPool) -> None: Waits until every queued table is written, the pool stays open.
+        close (self: WriterPool) -> dict: Waits for every queued table and returns write latency statistics.
+    """
+
+    def __init__(self, maxWorkers: int = 1, maxPending: int = None, backend: str = None):
+        self.maxWorkers = max(1, maxWorkers)
+        self.maxPending = maxPending or self.maxWorkers * 4
+        self.backend = backend
+        self.latencies = dict()
+        self.errors = list()
+        self._slots = threading.BoundedSemaphore(self.maxPending)
+        self._executor = ProcessPoolExecutor(max_workers=self.maxWorkers) if self.maxWorkers > 1 else None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback) -> None:
+        self.close()
+
+
+    def _on_done(self, future) -> None:
+        """Records the latency of a finished write and frees its slot."""
+        try:
+            excelPath, seconds = future.result()
+            self.latencies[excelPath] = seconds
+
+            # The file was counted in the worker process, count it in this one too.
+            count_file("Written", excelPath)
+        except Exception as e:
+            self.errors.append(e)
+        finally:
+            self._slots.release()
+
+
+    def submit(self, df: pd.DataFrame, excelPath: str) -> None:
+        """
+        Description: Queues a table to be written, blocks while the queue is full.
+        Parameters:
+            df (pd.DataFrame) : Rendered table.
+            excelPath (str) : Path to the xlsx file.
+        Returns:
+            None
+        """
+        if self._executor is None:
+            excelPath, seconds = _write_frame(df, excelPath, self.backend)
+            self.latencies[excelPath] = seconds
+            return
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(_write_frame, df, excelPath, self.backend)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._on_done)
+
+
+    def flush(self) -> None:
+        """Waits until every queued table is written, the pool stays open for more tables."""
+        if self._executor is None:
+            return
+
+        # Every free slot is a finished table, taking all of them means the queue is empty.
+        for _ in range(self.maxPending):
+            self._slots.acquire()
+        for _ in range(self.maxPending):
+            self._slots.release()
+
+        if self.errors:
+            raise self.errors[0]
+
+
+    def close(self) -> dict:
+        """
+        Description: Waits for every queued table, logs and returns the write latency statistics.
+        Parameters:
+            self (WriterPool) : WriterPool object.
+        Returns:
+            dict : {"files": int, "total": float, "mean": float, "p50": float, "p95": float, "max": float} (seconds)
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+        # Surface the first failed write, the tables would be silently missing otherwise.
+        if self.errors:
+            raise self.errors[0]
+
+        latencies = sorted(self.latencies.values())
+        statistics = {"files": len(latencies), "total": sum(latencies), "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        if latencies:
+            statistics.update(mean=statistics["total"] / len(latencies),
+                              p50=latencies[len(latencies) // 2],
+                              p95=latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                              max=latencies[-1])
+
+        LOGGER.info("Wrote %d files with %d writers: mean %.4fs, p50 %.4fs, p95 %.4fs, max %.4fs per file.",
+                    statistics["files"], self.maxWorkers, statistics["mean"], statistics["p50"],
+                    statistics["p95"], statistics["max"])
+        return statistics
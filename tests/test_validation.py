@@ -0,0 +1,42 @@
+# ===============================================
+import os
+import sys
+import pickle
+import subprocess
+import pandas as pd
+
+from benchmarks.generate import generate_dataset
+from src.validation import ValidationReport, LessonValidationError
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# ===============================================
+
+
+def test_lesson_validation_error_keeps_its_report_when_pickled():
+    report = ValidationReport()
+    report.add("table1.xlsx", "B3", "Table1's values must be numbers in between 0 and 1.")
+
+    error = pickle.loads(pickle.dumps(LessonValidationError(report)))
+
+    assert error.report.summary() == report.summary()
+    assert str(error) == str(LessonValidationError(report))
+
+
+def test_invalid_lesson_is_reported_from_worker_processes(tmp_path):
+    dataDir = str(tmp_path / "data")
+    generate_dataset(dataDir, lessons=3, students=20, assessments=4, programOutcomes=3)
+
+    # A relation out of [0, 1] in the second lesson, it is loaded in a worker process with --jobs 2.
+    lessonTitle = sorted(os.listdir(os.path.join(dataDir, "lessons")))[1]
+    tableOnePath = os.path.join(dataDir, "lessons", lessonTitle, "table1.xlsx")
+    tableOne = pd.read_excel(tableOnePath)
+    tableOne.iloc[1, 1] = 5
+    tableOne.to_excel(tableOnePath, index=False)
+
+    result = subprocess.run([sys.executable, "-m", "src", "--data-dir", dataDir, "--jobs", "2"],
+                            cwd=ROOT_DIR, capture_output=True, text=True)
+
+    assert result.returncode != 0
+    assert "BrokenProcessPool" not in result.stderr
+    assert "LessonValidationError" in result.stderr
+    assert "table1.xlsx B3" in result.stderr
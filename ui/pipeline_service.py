@@ -0,0 +1,404 @@
+# ================================================
+import time
+import logging
+import threading
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+
+# The pipeline (pandas, openpyxl, engine, writers) is imported once when the UI starts, every run reuses it.
+from src import main as pipeline
+from src import paths
+from src.validation import LessonValidationError
+from src.instrument import build_run_report
+from src.datalock import DataDirLock
+from src.cache import prune_cache
+
+LOGGER = logging.getLogger(__name__)
+
+# Requests that arrive within this many milliseconds of each other are merged into a single run.
+DEBOUNCE_MS = 500
+# Seconds to wait while another process (e.g. a command line run) is writing into the data folder.
+LOCK_TIMEOUT = 300
+# ================================================
+
+
+class RecomputeCancelled(Exception):
+    """Raised inside the pipeline when the running recompute was superseded by a newer request."""
+
+
+def merge_requests(requests: list) -> dict:
+    """
+    Helper function that merges recompute requests into a single request covering all of them.
+
+    Parameters:
+        requests (list): Requests as built by PipelineService.recompute().
+    Returns:
+        dict: Merged request. None means every lesson/student, so one None makes the merged scope None too.
+    """
+    lessonTitles = set()
+    studentIDs = set()
+    for request in requests:
+        lessonTitles = None if lessonTitles is None or request["lessonTitles"] is None else lessonTitles | request["lessonTitles"]
+        studentIDs = None if studentIDs is None or request["studentIDs"] is None else studentIDs | request["studentIDs"]
+
+    descriptions = list(dict.fromkeys(request["description"] for request in requests))
+    return {"lessonTitles": lessonTitles,
+            "studentIDs": studentIDs,
+            "description": descriptions[0] if len(descriptions) == 1 else f"{len(requests)} değişiklik için tablolar hesaplanıyor",
+            "queuedAt": min(request["queuedAt"] for request in requests),
+            "merged": sum(request.get("merged", 1) for request in requests)}
+
+
+def overlaps(first: dict, second: dict) -> bool:
+    """Helper function that checks if two requests recompute at least one common lesson."""
+    if first["lessonTitles"] is None or second["lessonTitles"] is None:
+        return True
+    return bool(first["lessonTitles"] & second["lessonTitles"])
+
+
+class PipelineWorker(QObject):
+    """
+    Class that runs the pipeline, it lives in the service's background thread.
+
+    Attributes:
+        jobs (int): Number of processes to load and aggregate the lessons with.
+        writeJobs (int): Number of processes to write the students' tables with.
+        excelBackend (str): xlsx backend.
+        cancelRequested (threading.Event): Set from the UI thread to stop the running recompute at the next student.
+
+    Member Functions:
+        run(self, request: dict) -> None: Runs a recompute request, emits finished, cancelled or failed.
+        apply_edit(self, edit: dict) -> None: Writes a change of the UI into the data folder, emits editFinished or editFailed.
+        stop(self) -> None: Stops the background thread once the work queued before it is done.
+        _report_progress(self, stage: str, done: int, total: int) -> None: Forwards the pipeline's progress and stops a cancelled run.
+    """
+
+    progress = pyqtSignal(str, int, int)
+    finished = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+    editFinished = pyqtSignal(object)
+    editFailed = pyqtSignal(object, str)
+
+    def __init__(self, jobs: int = 1, writeJobs: int = 1, excelBackend: str = None):
+        super().__init__()
+        self.jobs = jobs
+        self.writeJobs = writeJobs
+        self.excelBackend = excelBackend
+        self.cancelRequested = threading.Event()
+        self._lastProgress = None
+
+    def _report_progress(self, stage: str, done: int, total: int) -> None:
+        """
+        Utility function that forwards the pipeline's progress to the UI thread.
+        A signal for every student would flood the event loop, so only percent changes are sent.
+        The pipeline calls it between two students, a superseded run is stopped there, never in the middle of a file.
+
+        Parameters:
+            stage (str): Pipeline stage ('load', 'studentTables' or 'aggregate').
+            done (int): Finished items of the stage.
+            total (int): Items of the stage.
+        Returns: None
+        """
+        if self.cancelRequested.is_set():
+            raise RecomputeCancelled()
+
+        percent = (stage, 100 * done // total if total else 100)
+        if percent != self._lastProgress:
+            self._lastProgress = percent
+            self.progress.emit(stage, done, total)
+
+    @pyqtSlot(object)
+    def run(self, request: dict) -> None:
+        """
+        Main function that runs a recompute request in the background thread.
+
+        Parameters:
+            request (dict): {"lessonTitles": set | None, "studentIDs": set | None, "description": str, ...}
+        Returns: None
+        """
+        self._lastProgress = None
+        start = time.perf_counter()
+        try:
+            # The data folder has a single writer, a command line run that is writing into it is waited for.
+            with DataDirLock(paths.CACHE_DIR, LOCK_TIMEOUT):
+                # Forget the previous run's lessons and counters, the imported modules and the parse cache stay warm.
+                pipeline.reset_run_state()
+
+                # A lesson may have been renamed since the request was queued, only the lessons that still exist are run.
+                # If none is left there is nothing to do, an empty list would mean every lesson.
+                lessonTitles = None
+                if request["lessonTitles"] is not None:
+                    lessonTitles = sorted(request["lessonTitles"] & set(pipeline.LESSON_NAMES))
+                if lessonTitles != []:
+                    pipeline.run_full(readOnly=False, jobs=self.jobs, writeJobs=self.writeJobs, excelBackend=self.excelBackend,
+                                      lessonTitles=lessonTitles, studentIDs=request["studentIDs"],
+                                      progress=self._report_progress)
+
+                # Lessons are renamed and deleted from the UI, their cache entries are removed while the lock is held.
+                prune_cache()
+            report = build_run_report(time.perf_counter() - start, {"description": request["description"]})
+            self.finished.emit(report)
+
+        except RecomputeCancelled:
+            self.cancelled.emit()
+        except LessonValidationError as e:
+            self.failed.emit(f"Tablolarda hatalar var:\n{e.report.summary(limit=20)}")
+        except Exception as e:
+            LOGGER.exception("Recompute failed: %s", request["description"])
+            self.failed.emit(str(e))
+
+    @pyqtSlot(object)
+    def apply_edit(self, edit: dict) -> None:
+        """
+        Main function that writes a change of the UI (edited tables, renamed or created lesson) in the background thread.
+        It runs under the same lock as the recomputes, so the data folder never has two writers.
+
+        Parameters:
+            edit (dict): {"function": callable that writes the change, "lessonTitles": list | None, "description": str, ...}
+                         as built by PipelineService.edit().
+        Returns: None
+        """
+        try:
+            with DataDirLock(paths.CACHE_DIR, LOCK_TIMEOUT):
+                edit["function"]()
+            self.editFinished.emit(edit)
+
+        except LessonValidationError as e:
+            self.editFailed.emit(edit, f"Tablolarda hatalar var:\n{e.report.summary(limit=20)}")
+        except Exception as e:
+            LOGGER.exception("Edit failed: %s", edit["description"])
+            self.editFailed.emit(edit, str(e))
+
+    @pyqtSlot()
+    def stop(self) -> None:
+        """Main function that stops the background thread, it is queued after the pending work so no edit is lost."""
+        QThread.currentThread().quit()
+
+
+class PipelineService(QObject):
+    """
+    Class that owns the pipeline for the whole lifetime of the UI and schedules its recomputes.
+    Requests are debounced: the ones that arrive within DEBOUNCE_MS of each other are merged into a single run
+    that covers the union of their lessons. A running recompute whose lessons are requested again is cancelled
+    (its result would be overwritten anyway) and merged into the next run, so no change is lost.
+    Recomputes run one at a time in a single background QThread, which is the only writer of the data folder.
+    The UI's own changes (edited tables, renamed or created lessons) are written in the same thread through edit(),
+    in the order they were made, and their lessons are recomputed once they are written.
+
+    Attributes:
+        self.pending: Requests waiting for the debounce timer or for the running recompute.
+        self.running: Request that is running, None if the service is idle.
+        self.edits: Number of edits handed to the background thread and not written yet.
+        self.statistics: Counters for monitoring (requests, runs, merged, cancelled, failed, edits, editsFailed) and run latencies.
+
+    Member Functions:
+        Util:
+            _schedule(self) -> None: Merges the pending requests and starts them, cancels a superseded recompute.
+            _start(self, request: dict) -> None: Hands a request to the background thread.
+            _on_finished(self, report: dict) -> None: Function called when a recompute finishes.
+            _on_cancelled(self) -> None: Function called when a superseded recompute stopped.
+            _on_failed(self, message: str) -> None: Function called when a recompute fails.
+            _on_edit_finished(self, edit: dict) -> None: Function called when an edit was written, queues its recompute.
+            _on_edit_failed(self, edit: dict, message: str) -> None: Function called when an edit couldn't be written.
+            _done(self) -> None: Starts the pending requests after a recompute ended.
+
+        Main:
+            recompute(self, lessonTitles: list | None, studentIDs: set | None, description: str) -> None: Queues a recompute.
+            edit(self, function: callable, lessonTitles: list | None, description: str, onFinished: callable) -> None: Queues an edit.
+            queue_depth(self) -> int: Number of requests and edits waiting or running.
+            metrics(self) -> dict: Queue depth, counters and run latencies.
+            is_busy(self) -> bool: Checks if a recompute or an edit is running or queued.
+            shutdown(self) -> None: Writes the queued edits, cancels the pending recomputes and stops the background thread.
+    """
+
+    runStarted = pyqtSignal(str)
+    progress = pyqtSignal(str, int, int)
+    runFinished = pyqtSignal(str, object)
+    runFailed = pyqtSignal(str, str)
+    queueDepthChanged = pyqtSignal(int)
+    editFinished = pyqtSignal(str)
+    editFailed = pyqtSignal(str, str)
+
+    # Requests are handed to the worker through signals, so the worker's slots run in the background thread.
+    # Queued signals are delivered in order, an edit is written after the recompute that was running and before the next one.
+    _runRequested = pyqtSignal(object)
+    _editRequested = pyqtSignal(object)
+    _stopRequested = pyqtSignal()
+
+    def __init__(self, parent: QObject = None, jobs: int = 1, writeJobs: int = 1, excelBackend: str = None,
+                 debounceMs: int = DEBOUNCE_MS):
+        super().__init__(parent)
+        self.pending = list()
+        self.running = None
+        self.edits = 0
+        self.statistics = {"requests": 0, "runs": 0, "merged": 0, "cancelled": 0, "failed": 0, "edits": 0, "editsFailed": 0,
+                           "lastLatency": None, "lastRunSeconds": None, "totalLatency": 0.0}
+
+        # Every request restarts the timer, the pending requests are scheduled once the user stops editing.
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(debounceMs)
+        self._debounce.timeout.connect(self._schedule)
+
+        self._thread = QThread(self)
+        self._worker = PipelineWorker(jobs, writeJobs, excelBackend)
+        self._worker.moveToThread(self._thread)
+        self._thread.finished.connect(self._worker.deleteLater)
+
+        self._runRequested.connect(self._worker.run)
+        self._editRequested.connect(self._worker.apply_edit)
+        self._stopRequested.connect(self._worker.stop)
+        self._worker.progress.connect(self.progress)
+        self._worker.finished.connect(self._on_finished)
+        self._worker.cancelled.connect(self._on_cancelled)
+        self._worker.failed.connect(self._on_failed)
+        self._worker.editFinished.connect(self._on_edit_finished)
+        self._worker.editFailed.connect(self._on_edit_failed)
+        self._thread.start()
+
+    # ================================================ Util
+    def _schedule(self) -> None:
+        """Utility function that merges the pending requests into one run, or cancels the running one if it is superseded."""
+        if not self.pending:
+            return
+
+        # A single writer: while a recompute runs the requests wait. If they recompute the same lessons,
+        # the running result is outdated, stop it and merge it into the next run (see _on_cancelled).
+        if self.running is not None:
+            if any(overlaps(self.running, request) for request in self.pending):
+                self._worker.cancelRequested.set()
+            return
+
+        request = merge_requests(self.pending)
+        self.statistics["merged"] += len(self.pending) - 1
+        self.pending.clear()
+        self._start(request)
+
+    def _start(self, request: dict) -> None:
+        """Utility function that hands a request to the background thread."""
+        self.running = request
+        self._worker.cancelRequested.clear()
+        self.statistics["runs"] += 1
+        self.runStarted.emit(request["description"])
+        self._runRequested.emit(request)
+
+    def _on_finished(self, report: dict) -> None:
+        """Utility function called in the UI thread when a recompute finishes."""
+        request, self.running = self.running, None
+
+        # Latency is measured from the oldest request of the run, so time spent debounced and queued is included.
+        latency = time.monotonic() - request["queuedAt"]
+        self.statistics["lastLatency"] = latency
+        self.statistics["lastRunSeconds"] = report["wallSeconds"]
+        self.statistics["totalLatency"] += latency
+        LOGGER.info("Recompute done in %.2fs (%.2fs after the request), %d request(s) merged, queue depth %d.",
+                    report["wallSeconds"], latency, request["merged"], len(self.pending))
+
+        self.runFinished.emit(request["description"], report)
+        self._done()
+
+    def _on_cancelled(self) -> None:
+        """Utility function called in the UI thread when a superseded recompute stopped, its scope is merged into the next run."""
+        request, self.running = self.running, None
+        self.statistics["cancelled"] += 1
+        self.pending.insert(0, request)
+        self._done()
+
+    def _on_failed(self, message: str) -> None:
+        """Utility function called in the UI thread when a recompute fails."""
+        request, self.running = self.running, None
+        self.statistics["failed"] += 1
+        self.runFailed.emit(request["description"], message)
+        self._done()
+
+    def _on_edit_finished(self, edit: dict) -> None:
+        """Utility function called in the UI thread when an edit was written, its lessons are recomputed."""
+        self.edits -= 1
+        self.statistics["edits"] += 1
+        if edit["onFinished"] is not None:
+            edit["onFinished"]()
+        self.editFinished.emit(edit["description"])
+        self.recompute(edit["lessonTitles"], description=edit["recomputeDescription"])
+
+    def _on_edit_failed(self, edit: dict, message: str) -> None:
+        """Utility function called in the UI thread when an edit couldn't be written, nothing is recomputed."""
+        self.edits -= 1
+        self.statistics["editsFailed"] += 1
+        self.editFailed.emit(edit["description"], message)
+        self.queueDepthChanged.emit(self.queue_depth())
+
+    def _done(self) -> None:
+        """Utility function that schedules the requests that arrived during the recompute, unless more are being debounced."""
+        self.queueDepthChanged.emit(self.queue_depth())
+        if not self._debounce.isActive():
+            self._schedule()
+
+    # ================================================ Main
+    def recompute(self, lessonTitles: list = None, studentIDs: set = None, description: str = "") -> None:
+        """
+        Main function that queues a recompute, it returns right away.
+
+        Parameters:
+            lessonTitles (list): Lessons to recompute, every lesson if None.
+            studentIDs (set): Students whose tables are rewritten, every student of the lessons if None.
+            description (str): Text shown to the user while the recompute runs.
+        Returns: None
+        """
+        self.pending.append({"lessonTitles": set(lessonTitles) if lessonTitles else None,
+                             "studentIDs": set(studentIDs) if studentIDs else None,
+                             "description": description or "Tablolar hesaplanıyor",
+                             "queuedAt": time.monotonic()})
+        self.statistics["requests"] += 1
+        self.queueDepthChanged.emit(self.queue_depth())
+        self._debounce.start()
+
+    def edit(self, function, lessonTitles: list = None, description: str = "", onFinished=None) -> None:
+        """
+        Main function that queues a change of the UI to be written in the background thread, it returns right away.
+        A running recompute of the same lessons is cancelled, it would read the tables while they change.
+        Once the change is written onFinished is called in the UI thread and the lessons are recomputed.
+
+        Parameters:
+            function (callable): Writes the change, called without arguments in the background thread.
+            lessonTitles (list): Lessons to recompute after the change (their names after it), every lesson if None.
+            description (str): Text shown to the user about the change, e.g. "<lesson> dersinin değişiklikleri".
+            onFinished (callable): Called without arguments in the UI thread once the change is written.
+        Returns: None
+        """
+        edit = {"function": function,
+                "lessonTitles": list(lessonTitles) if lessonTitles else None,
+                "description": description or "Değişiklikler",
+                "recomputeDescription": f"{', '.join(lessonTitles)} dersinin tabloları hesaplanıyor" if lessonTitles else "",
+                "onFinished": onFinished}
+
+        if self.running is not None and overlaps(self.running, {"lessonTitles": set(lessonTitles) if lessonTitles else None}):
+            self._worker.cancelRequested.set()
+
+        self.edits += 1
+        self.queueDepthChanged.emit(self.queue_depth())
+        self._editRequested.emit(edit)
+
+    def queue_depth(self) -> int:
+        """Main function that returns the number of requests and edits waiting or running."""
+        return len(self.pending) + (self.running is not None) + self.edits
+
+    def metrics(self) -> dict:
+        """Main function that returns the queue depth, the counters and the mean/last run latency (seconds) for monitoring."""
+        finishedRuns = self.statistics["runs"] - self.statistics["cancelled"] - self.statistics["failed"] - (self.running is not None)
+        return dict(self.statistics, queueDepth=self.queue_depth(),
+                    meanLatency=self.statistics["totalLatency"] / finishedRuns if finishedRuns > 0 else None)
+
+    def is_busy(self) -> bool:
+        """Main function that checks if a recompute or an edit is running or queued."""
+        return self.queue_depth() > 0
+
+    def shutdown(self) -> None:
+        """
+        Main function that drops the pending requests, stops the running recompute at the next student and stops the thread.
+        The queued edits are the user's changes, they are still written before the thread stops.
+        """
+        self._debounce.stop()
+        self.pending.clear()
+        self._worker.cancelRequested.set()
+        self._stopRequested.emit()
+        self._thread.wait()
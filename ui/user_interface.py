@@ -3,18 +3,16 @@ from PyQt5 import QtWidgets
 from pathlib import Path
 from typing import TypeVar
 from PyQt5.QtCore import pyqtSignal
-from src.setget import set_percentage, set_column_name, get_percentage, get_column_names
+from src.setget import LessonEditSession, lesson_metadata
+from src.validation import validate_lesson_files, LessonValidationError
+from src.paths import DATA_DIR, LESSONS_DIR
+from ui.pipeline_service import PipelineService
 
-import subprocess
 import win32com.client as win32
 import os
 import shutil
 import sys
 
-ROOT_DIR = Path(__file__).parent.parent.absolute()
-DATA_DIR = f'{ROOT_DIR}\\data'
-LESSONS_DIR = rf'{ROOT_DIR}\data\lessons'
-STUDENTS_DIR = rf'{ROOT_DIR}\data\students'
 inputButtonObject = TypeVar('inputButtonObject')
 inputVariableToBeChecked = TypeVar('inputVariableToBeChecked')
 # ================================================
@@ -25,6 +23,7 @@ class CreateLessonWindow(QtWidgets.QWidget):
     Class for "Ders Oluştur" tab.
 
     Attributes:
+        self.pipelineService: Service that computes the lesson's tables in the background.
         self.studentGradesPath: Path to the student grades table.
         self.table1Path: Path to the table 1.
         self.table2Path: Path to the table 2.
@@ -54,9 +53,10 @@ class CreateLessonWindow(QtWidgets.QWidget):
 
     lessonCreated = pyqtSignal()
 
-    def __init__(self):
+    def __init__(self, pipelineService: PipelineService = None):
         super().__init__()
         self._initialize()
+        self.pipelineService = pipelineService
         self.studentGradesPath = None
         self.table1Path = None
         self.table2Path = None
@@ -259,10 +259,19 @@ class CreateLessonWindow(QtWidgets.QWidget):
             self._show_error_message("Eksik Bilgi", "Lütfen tüm bilgileri eksiksiz doldurun.")
             return
 
+        # Validate the uploaded tables before anything is copied or computed, every bad cell is listed at once.
+        validationReport = validate_lesson_files(self.table1Path, self.table2Path, self.studentGradesPath)
+        if not validationReport.is_valid():
+            self._show_error_message("Hatalı Tablo", f"Yüklenen tablolarda hatalar var:\n{validationReport.summary(limit=20)}")
+            return
+
         # Create or replace lesson directory.
         lessonPath = Path(LESSONS_DIR) / lessonTitle
+        # (source file, name that main.py uses), the paths are taken now since the inputs are cleared right away.
+        lessonFiles = [(self.studentGradesPath, "grades.xlsx"), (self.table1Path, "table1.xlsx"), (self.table2Path, "table2.xlsx"),
+                       (self.programOutputPath, "program_output.xlsx"), (self.lessonOutputPath, "lesson_output.xlsx")]
 
-        try:
+        def copy_lesson_files() -> None:
             if lessonPath.exists():
                 # Clear the existing directory
                 for file in lessonPath.iterdir():
@@ -272,19 +281,24 @@ class CreateLessonWindow(QtWidgets.QWidget):
                 os.makedirs(lessonPath)
 
             # Copy files to lesson directory, change their names so that main.py can use them.
-            shutil.copy(self.studentGradesPath, lessonPath / "grades.xlsx")
-            shutil.copy(self.table1Path, lessonPath / "table1.xlsx")
-            shutil.copy(self.table2Path, lessonPath / "table2.xlsx")
-            shutil.copy(self.programOutputPath, lessonPath / "program_output.xlsx")
-            shutil.copy(self.lessonOutputPath, lessonPath / "lesson_output.xlsx")
-
-            self._show_info_message("Başarılı", f"Ders başarıyla oluşturuldu: {lessonTitle}")
+            for sourcePath, fileName in lessonFiles:
+                shutil.copy(sourcePath, lessonPath / fileName)
 
+        try:
+            # The files are copied in the background thread under the data folder lock, so a running recompute
+            # never reads a half-copied lesson. Only the new lesson is computed afterwards, the window stays responsive.
             # Ders oluşturulduğunda sinyal gönder
-            self.lessonCreated.emit()
+            if self.pipelineService is not None:
+                self.pipelineService.edit(copy_lesson_files, [lessonTitle], description=f"{lessonTitle} dersinin dosyaları",
+                                          onFinished=self.lessonCreated.emit)
+                self._show_info_message("Başarılı", f"Ders oluşturuluyor: {lessonTitle}\n"
+                                                    f"Dosyalar kopyalandıktan sonra tablolar arka planda hesaplanacak.")
+            else:
+                copy_lesson_files()
+                self.lessonCreated.emit()
+                self._show_info_message("Başarılı", f"Ders başarıyla oluşturuldu: {lessonTitle}")
 
             self._clear_inputs()
-            subprocess.call(f"python {ROOT_DIR}/src/main.py", shell=False)
 
         except Exception as e:
             self._show_error_message("Hata", f"Ders oluşturulurken bir hata oluştu: {str(e)}")
@@ -331,6 +345,7 @@ class EditLessonWindow(QtWidgets.QWidget):
         self.inputField1: First string input field.
         self.inputField2: Second string input field.
         self.inputField3: Third string input field.
+        self.pipelineService: Service that recomputes the edited lesson's tables in the background.
 
     Member Functions:
         Helper:
@@ -345,8 +360,9 @@ class EditLessonWindow(QtWidgets.QWidget):
             go_back_to_main_menu(self) -> None: Function to go back to the main menu.
     """
 
-    def __init__(self):
+    def __init__(self, pipelineService: PipelineService = None):
         super().__init__()
+        self.pipelineService = pipelineService
         self._initialize()
 
         # Initialize the input fields
@@ -424,14 +440,16 @@ class EditLessonWindow(QtWidgets.QWidget):
             return
 
         try:
-            columns_list = get_column_names(selected_lesson)
+            # İsimler ve yüzdelikler bellekten gelir, table2 sadece değiştiyse tekrar okunur
+            names, percentages = lesson_metadata(selected_lesson)
+            columns_list = [str(name) for name in names]
             print(f"Kolon İsimleri: {columns_list}")
 
             # Sütun isimlerini sadece input alanı başlatılmışsa güncelle
             if self.inputField2:
                 self.inputField2.setText(",".join(columns_list))  # Default column names
 
-            percentages = [str(get_percentage(selected_lesson, col)) for col in columns_list]
+            percentages = [str(percentage) for percentage in percentages]
             print(f"Yüzdelikler: {percentages}")
 
             # Yüzde bilgilerini sadece input alanı başlatılmışsa güncelle
@@ -448,46 +466,64 @@ class EditLessonWindow(QtWidgets.QWidget):
 
             # 1. Dersin ismi
             new_lesson_name = self.inputField1.text().strip()
-            if new_lesson_name:  # Eğer isim boş değilse
-                # Yeni ismin, dersler içinde var olmadığını kontrol et
-                if new_lesson_name in os.listdir(LESSONS_DIR):
-                    self._show_error_message("Hata", f"{new_lesson_name} ismi zaten mevcut!")
-                    return
-                else:
-                    # Ders ismini değiştir
-                    os.rename(os.path.join(DATA_DIR, "lessons", selected_lesson),
-                              os.path.join(DATA_DIR, "lessons", new_lesson_name))
-                    print(f"Ders ismi {selected_lesson} -> {new_lesson_name} olarak değiştirildi.")
+            # Yeni ismin, dersler içinde var olmadığını kontrol et
+            if new_lesson_name and new_lesson_name in os.listdir(LESSONS_DIR):
+                self._show_error_message("Hata", f"{new_lesson_name} ismi zaten mevcut!")
+                return
+
+            # Kolon sayısı kontrolü için tablo sadece okunur, yazma işi arka plandaki hesaplama iş parçacığında yapılır
+            assessmentCount = len(lesson_metadata(selected_lesson)[0])
 
             # 2. Sütun isimleri
+            new_column_names_list = None
             new_column_names = self.inputField2.text().strip()
             if new_column_names:  # Eğer sütun isimleri boş değilse
                 new_column_names_list = [name.strip() for name in new_column_names.split(",")]
-                current_columns = get_column_names(selected_lesson)
-
-                if len(new_column_names_list) == len(current_columns):
-                    # Kolon isimlerini değiştir
-                    for old_name, new_name in zip(current_columns, new_column_names_list):
-                        set_column_name(selected_lesson, new_name, old_name)
-                    print(f"Sütun isimleri değiştirildi: {new_column_names_list}")
-                else:
+                if len(new_column_names_list) != assessmentCount:
                     self._show_error_message("Hata", "Yeni sütun isimleri mevcut kolon sayısıyla uyumsuz!")
+                    return
 
             # 3. Yüzdelikler
+            new_percentages_list = None
             new_percentages = self.inputField3.text().strip()
             if new_percentages:  # Eğer yüzdeler boş değilse
                 new_percentages_list = [int(p.strip()) for p in new_percentages.split(",")]
-                current_columns = get_column_names(selected_lesson)
-
-                if len(new_percentages_list) == len(current_columns):
-                    # Yüzdeleri değiştir
-                    for col, percentage in zip(current_columns, new_percentages_list):
-                        set_percentage(selected_lesson, col, percentage)
-                    print(f"Yüzdelikler değiştirildi: {new_percentages_list}")
-                else:
+                if len(new_percentages_list) != assessmentCount:
                     self._show_error_message("Hata", "Yeni yüzdeler mevcut kolon sayısıyla uyumsuz!")
+                    return
+
+            def write_changes() -> None:
+                # Sütun isimleri ve yüzdelikler tek oturumda değiştirilir: table2 bir kere okunur, bir kere yazılır
+                # Oturum burada açılır, sıradaki önceki değişiklikler yazılmış olur
+                session = LessonEditSession(selected_lesson)
+                if new_column_names_list is not None:
+                    session.set_column_names(new_column_names_list)
+                if new_percentages_list is not None:
+                    session.set_percentages(new_percentages_list)
+
+                # Yüzdeliklerin toplamı 100 değilse hiçbir dosya yazılmaz
+                if session.commit():
+                    print(f"Sütun isimleri: {session.column_names()}, yüzdelikler: {session.percentages()}")
+
+                # Ders ismini en son değiştir, tablolar eski klasöre yazıldı
+                if new_lesson_name:
+                    newLessonPath = os.path.join(LESSONS_DIR, new_lesson_name)
+                    if os.path.exists(newLessonPath):
+                        raise FileExistsError(f"{new_lesson_name} ismi zaten mevcut!")
+                    os.rename(os.path.join(LESSONS_DIR, selected_lesson), newLessonPath)
+                    print(f"Ders ismi {selected_lesson} -> {new_lesson_name} olarak değiştirildi.")
 
-            self._show_success_message("Başarılı", "Değişiklikler kaydedildi.")
+            # Dosyalar, data klasörünün tek yazıcısı olan arka plan iş parçacığında kilit altında yazılır,
+            # ardından tablolar yeniden hesaplanır. Art arda yapılan kayıtlar sırayla yazılır.
+            lessonTitle = new_lesson_name or selected_lesson
+            if self.pipelineService is not None:
+                self.pipelineService.edit(write_changes, [lessonTitle], description=f"{lessonTitle} dersinin değişiklikleri")
+                self._show_info_message("Başarılı", "Değişiklikler arka planda kaydediliyor.")
+            else:
+                write_changes()
+                self._show_info_message("Başarılı", "Değişiklikler kaydedildi.")
+        except LessonValidationError as e:
+            self._show_error_message("Hata", f"Değişiklikler kaydedilmedi:\n{e.report.summary()}")
         except Exception as e:
             print(f"Hata oluştu: {e}")
             self._show_error_message("Hata", f"Bir hata oluştu: {e}")
@@ -546,11 +582,31 @@ class EditLessonWindow(QtWidgets.QWidget):
 
 
 class MainWindow(QtWidgets.QMainWindow):
+    # Hesaplama aşamalarının durum çubuğunda gösterilen isimleri
+    STAGE_NAMES = {"load": "Dersler yükleniyor", "studentTables": "Öğrenci tabloları yazılıyor",
+                   "aggregate": "Ders tabloları birleştiriliyor"}
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Ana Menü")
         self.setFixedSize(300, 350)
 
+        # Hesaplama servisi pencere açık olduğu sürece yaşar, hesaplamalar arka plandaki iş parçacığında çalışır
+        self.pipelineService = PipelineService(self)
+        self.pipelineService.runStarted.connect(self.on_run_started)
+        self.pipelineService.progress.connect(self.on_run_progress)
+        self.pipelineService.runFinished.connect(self.on_run_finished)
+        self.pipelineService.runFailed.connect(self.on_run_failed)
+        self.pipelineService.queueDepthChanged.connect(self.on_queue_depth_changed)
+        self.pipelineService.editFinished.connect(self.on_edit_finished)
+        self.pipelineService.editFailed.connect(self.on_edit_failed)
+
+        # Durum çubuğunda ilerleme göstergesi, sadece hesaplama sırasında görünür
+        self.progressBar = QtWidgets.QProgressBar()
+        self.progressBar.setMaximumWidth(120)
+        self.progressBar.hide()
+        self.statusBar().addPermanentWidget(self.progressBar)
+
         # Menü Çubuğu
         menuBar = self.menuBar()
         lessonMenu = menuBar.addMenu("Ders İşlemleri")
@@ -606,14 +662,14 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def open_create_lesson_window(self) -> None:
         # Ders Oluşturma Penceresini Aç
-        self.createLessonWindow = CreateLessonWindow()
+        self.createLessonWindow = CreateLessonWindow(self.pipelineService)
         # CreateLessonWindow'dan gelen sinyali dinleyin
         self.createLessonWindow.lessonCreated.connect(self.update_combobox)
         self.createLessonWindow.show()
 
     def open_edit_lesson_window(self) -> None:
         # Dersi Düzenleme Penceresini Aç
-        self.editLessonWindow = EditLessonWindow()
+        self.editLessonWindow = EditLessonWindow(self.pipelineService)
         self.editLessonWindow.show()
 
     def update_combobox(self) -> None:
@@ -621,6 +677,51 @@ class MainWindow(QtWidgets.QMainWindow):
         self.comboBox.clear()
         self.comboBox.addItems(os.listdir(LESSONS_DIR))
 
+    def on_run_started(self, description: str) -> None:
+        # Hesaplama başladı, ilerleme göstergesini aç
+        self.statusBar().showMessage(description)
+        self.progressBar.setValue(0)
+        self.progressBar.show()
+
+    def on_run_progress(self, stage: str, done: int, total: int) -> None:
+        # Aşamanın ilerlemesini göster
+        self.statusBar().showMessage(self.STAGE_NAMES.get(stage, stage))
+        self.progressBar.setMaximum(max(total, 1))
+        self.progressBar.setValue(done)
+
+    def on_run_finished(self, description: str, report: dict) -> None:
+        # Kuyrukta bekleyen hesaplama yoksa göstergeyi kapat
+        if not self.pipelineService.is_busy():
+            self.progressBar.hide()
+        self.statusBar().showMessage(f"Tablolar güncellendi ({report['wallSeconds']:.1f} sn).", 5000)
+
+    def on_run_failed(self, description: str, message: str) -> None:
+        if not self.pipelineService.is_busy():
+            self.progressBar.hide()
+        self.statusBar().clearMessage()
+        QtWidgets.QMessageBox.warning(self, "Hata", f"{description} sırasında bir hata oluştu:\n{message}")
+
+    def on_edit_finished(self, description: str) -> None:
+        # Değişiklik yazıldı, ders eklenmiş veya adı değişmiş olabilir
+        self.update_combobox()
+        self.statusBar().showMessage(f"{description} kaydedildi.", 5000)
+
+    def on_edit_failed(self, description: str, message: str) -> None:
+        # Değişiklik yazılamadı, dosyalar eski haliyle kaldı, hesaplama yapılmaz
+        if not self.pipelineService.is_busy():
+            self.progressBar.hide()
+        QtWidgets.QMessageBox.warning(self, "Hata", f"{description} kaydedilemedi:\n{message}")
+
+    def on_queue_depth_changed(self, depth: int) -> None:
+        # Bekleyen ve çalışan hesaplama sayısını göstergenin ipucunda göster
+        self.progressBar.setToolTip(f"Sıradaki hesaplamalar: {depth}")
+
+    def closeEvent(self, event) -> None:
+        # Bekleyen hesaplamaları bırak, çalışanı sıradaki öğrencide durdur, yarım yazılmış tablo kalmasın
+        # Sıradaki değişiklikler kullanıcının kayıtlarıdır, onlar kapanmadan önce yazılır
+        self.pipelineService.shutdown()
+        super().closeEvent(event)
+
     def on_combobox_selection(self, index) -> None:
         selectedItem = self.comboBox.currentText()
 